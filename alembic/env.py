@@ -19,6 +19,7 @@ from pathlib import Path
 sys.path.append(str(Path(__file__).resolve().parents[1]))
 
 from app.core.config import settings
+from app.core.database import async_database_url
 from app.models.domain import Base
 # --------------------------------------------------------------------------
 
@@ -27,7 +28,7 @@ config = context.config
 if config.config_file_name is not None:
     fileConfig(config.config_file_name)
 
-config.set_main_option("sqlalchemy.url", settings.DATABASE_URL)
+config.set_main_option("sqlalchemy.url", async_database_url(settings.DATABASE_URL))
 
 target_metadata = Base.metadata
 
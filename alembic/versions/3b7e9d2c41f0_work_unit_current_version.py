@@ -0,0 +1,37 @@
+"""work_unit_current_version
+
+Revision ID: 3b7e9d2c41f0
+Revises: a01fd80fff1f
+Create Date: 2026-10-17 10:12:40.518302
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3b7e9d2c41f0'
+down_revision: Union[str, Sequence[str], None] = 'a01fd80fff1f'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    with op.batch_alter_table('work_units', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('current_version', sa.Integer(), nullable=True))
+
+    # Backfill: the latest uploaded version of every unit
+    op.execute(
+        "UPDATE work_units SET current_version = ("
+        "SELECT MAX(trial_balance_entries.version_number) FROM trial_balance_entries "
+        "WHERE trial_balance_entries.work_unit_id = work_units.id)"
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.batch_alter_table('work_units', schema=None) as batch_op:
+        batch_op.drop_column('current_version')
@@ -0,0 +1,30 @@
+"""compliance_template_revision
+
+Revision ID: 5d8a3f6b2e71
+Revises: 7c2f5a8e1d36
+Create Date: 2026-10-17 14:02:11.604218
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5d8a3f6b2e71'
+down_revision: Union[str, Sequence[str], None] = '7c2f5a8e1d36'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    with op.batch_alter_table('compliance_templates', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('revision', sa.Integer(), server_default='1', nullable=False))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.batch_alter_table('compliance_templates', schema=None) as batch_op:
+        batch_op.drop_column('revision')
@@ -0,0 +1,59 @@
+"""hot_path_indexes
+
+Revision ID: b1072b7a7de0
+Revises: b6e0c4d91f25
+Create Date: 2026-10-17 16:42:10.512904
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b1072b7a7de0'
+down_revision: Union[str, Sequence[str], None] = 'b6e0c4d91f25'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    with op.batch_alter_table('accounts', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_accounts_parent_id'), ['parent_id'], unique=False)
+
+    with op.batch_alter_table('financial_works', schema=None) as batch_op:
+        batch_op.create_index('ix_financial_works_company_end_date', ['company_id', 'end_date'], unique=False)
+
+    with op.batch_alter_table('mapping_rules', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_mapping_rules_company_id'), ['company_id'], unique=False)
+
+    with op.batch_alter_table('signatories', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_signatories_company_id'), ['company_id'], unique=False)
+
+    with op.batch_alter_table('trial_balance_entries', schema=None) as batch_op:
+        batch_op.create_index('ix_trial_balance_entries_unit_version', ['work_unit_id', 'version_number'], unique=False)
+
+    with op.batch_alter_table('work_units', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_work_units_financial_work_id'), ['financial_work_id'], unique=False)
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.batch_alter_table('work_units', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_work_units_financial_work_id'))
+
+    with op.batch_alter_table('trial_balance_entries', schema=None) as batch_op:
+        batch_op.drop_index('ix_trial_balance_entries_unit_version')
+
+    with op.batch_alter_table('signatories', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_signatories_company_id'))
+
+    with op.batch_alter_table('mapping_rules', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_mapping_rules_company_id'))
+
+    with op.batch_alter_table('financial_works', schema=None) as batch_op:
+        batch_op.drop_index('ix_financial_works_company_end_date')
+
+    with op.batch_alter_table('accounts', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_accounts_parent_id'))
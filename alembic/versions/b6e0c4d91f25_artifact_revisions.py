@@ -0,0 +1,42 @@
+"""artifact_revisions
+
+Revision ID: b6e0c4d91f25
+Revises: 5d8a3f6b2e71
+Create Date: 2026-10-17 15:20:47.118093
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b6e0c4d91f25'
+down_revision: Union[str, Sequence[str], None] = '5d8a3f6b2e71'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    with op.batch_alter_table('financial_works', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('data_revision', sa.Integer(), server_default='1', nullable=False))
+
+    with op.batch_alter_table('report_templates', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('revision', sa.Integer(), server_default='1', nullable=False))
+
+    with op.batch_alter_table('organization_settings', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('revision', sa.Integer(), server_default='1', nullable=False))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.batch_alter_table('organization_settings', schema=None) as batch_op:
+        batch_op.drop_column('revision')
+
+    with op.batch_alter_table('report_templates', schema=None) as batch_op:
+        batch_op.drop_column('revision')
+
+    with op.batch_alter_table('financial_works', schema=None) as batch_op:
+        batch_op.drop_column('data_revision')
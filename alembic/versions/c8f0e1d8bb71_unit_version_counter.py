@@ -0,0 +1,38 @@
+"""unit_version_counter
+
+Revision ID: c8f0e1d8bb71
+Revises: b1072b7a7de0
+Create Date: 2026-10-17 18:05:31.274416
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c8f0e1d8bb71'
+down_revision: Union[str, Sequence[str], None] = 'b1072b7a7de0'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    with op.batch_alter_table('work_units', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('last_allocated_version', sa.Integer(), server_default='0', nullable=False))
+
+    # Continue from the highest version each unit already has
+    op.execute(
+        "UPDATE work_units SET last_allocated_version = COALESCE("
+        "(SELECT MAX(version_number) FROM trial_balance_entries WHERE work_unit_id = work_units.id), "
+        "current_version, 0)"
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.batch_alter_table('work_units', schema=None) as batch_op:
+        batch_op.drop_column('last_allocated_version')
+
@@ -0,0 +1,45 @@
+"""work_unit_balances
+
+Revision ID: e41a6c0d9b27
+Revises: 3b7e9d2c41f0
+Create Date: 2026-10-17 11:03:55.207114
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e41a6c0d9b27'
+down_revision: Union[str, Sequence[str], None] = '3b7e9d2c41f0'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('work_unit_balances',
+    sa.Column('work_unit_id', sa.Integer(), nullable=False),
+    sa.Column('account_sub_head_id', sa.Integer(), nullable=False),
+    sa.Column('amount', sa.Numeric(precision=18, scale=2), nullable=False),
+    sa.ForeignKeyConstraint(['account_sub_head_id'], ['accounts.id'], ),
+    sa.ForeignKeyConstraint(['work_unit_id'], ['work_units.id'], ),
+    sa.PrimaryKeyConstraint('work_unit_id', 'account_sub_head_id')
+    )
+
+    # Backfill from the mapped entries of every unit's current version
+    op.execute(
+        "INSERT INTO work_unit_balances (work_unit_id, account_sub_head_id, amount) "
+        "SELECT tbe.work_unit_id, m.account_sub_head_id, SUM(tbe.closing_balance) "
+        "FROM trial_balance_entries tbe "
+        "JOIN mapped_ledger_entries m ON m.trial_balance_entry_id = tbe.id "
+        "JOIN work_units u ON u.id = tbe.work_unit_id AND u.current_version = tbe.version_number "
+        "GROUP BY tbe.work_unit_id, m.account_sub_head_id"
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('work_unit_balances')
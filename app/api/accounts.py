@@ -3,61 +3,90 @@ import io
 import pandas as pd
 from fastapi import APIRouter, Depends, HTTPException, UploadFile, File
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
-from typing import List, Dict, Any
+from sqlalchemy import select, text, update
+from typing import List, Dict, Optional, Tuple
 
 from app.core.dependencies import get_db
 from app.models.domain import Account, AccountType, CategoryType
 from app.schemas.account_schemas import AccountCreate, AccountRead
+from app.services.bulk_write_service import bulk_insert
+from app.services.coa_cache import bump_coa_version
 
 router = APIRouter()
 
 # --- Helpers ---
 
-async def get_or_create_account(
-    db: AsyncSession, 
-    name: str, 
-    acc_type: str, 
-    cat_type: str, 
-    parent_id: int = None,
-    cache: Dict = None
-) -> Account:
+# We map "ASSET" -> Name "Assets" for cleaner display, else use the raw value.
+PRETTY_CATEGORY_NAMES = {
+    "ASSET": "Assets",
+    "LIABILITY": "Liabilities",
+    "EQUITY": "Equity",
+    "INCOME": "Income",
+    "EXPENSE": "Expenses"
+}
+
+AccountKey = Tuple[str, str, Optional[int]] # (name, type, parent_id)
+
+class _HierarchyBuilder:
     """
-    Helper to find an account or create it if it doesn't exist.
-    Uses a local cache to speed up bulk imports.
+    Works out the missing CATEGORY/HEAD/SUB_HEAD nodes of a CoA import in memory.
+    New nodes get placeholder ids (-1, -2, ... in row order) until real ids are
+    reserved for them; `assign_ids` then swaps them in, parents included.
     """
-    key = (name, acc_type, parent_id)
-    
-    # 1. Check Cache
-    if cache and key in cache:
-        return cache[key]
-
-    # 2. Check Database
-    stmt = select(Account).where(
-        Account.name == name,
-        Account.type == acc_type,
-        Account.parent_id == parent_id
-    )
-    result = await db.execute(stmt)
-    account = result.scalars().first()
-
-    # 3. Create if missing
-    if not account:
-        account = Account(
-            name=name,
-            type=acc_type,
-            category_type=cat_type,
-            parent_id=parent_id
+    def __init__(self, existing: Dict[AccountKey, int]):
+        self.existing = existing
+        self.pending: Dict[str, List[Dict]] = {t.value: [] for t in AccountType}
+        self.new_count = 0
+
+    def resolve(self, name: str, acc_type: str, cat_type: str, parent_id: Optional[int]) -> int:
+        key = (name, acc_type, parent_id)
+        acc_id = self.existing.get(key)
+        if acc_id is None:
+            self.new_count += 1
+            acc_id = -self.new_count
+            self.existing[key] = acc_id
+            self.pending[acc_type].append({
+                "id": acc_id, "name": name, "type": acc_type,
+                "category_type": cat_type, "parent_id": parent_id
+            })
+        return acc_id
+
+    def assign_ids(self, ids: List[int]):
+        """`ids[i]` replaces placeholder -(i + 1)."""
+        def real(acc_id):
+            return ids[-acc_id - 1] if acc_id is not None and acc_id < 0 else acc_id
+        for rows in self.pending.values():
+            for row in rows:
+                row["id"], row["parent_id"] = real(row["id"]), real(row["parent_id"])
+
+async def _lock_accounts(db: AsyncSession):
+    """
+    Serializes CoA imports until the transaction ends, so two imports cannot
+    both add the same node; single inserts wait for the import, reads do not.
+    """
+    if db.get_bind().dialect.name == "postgresql":
+        await db.execute(text("LOCK TABLE accounts IN SHARE ROW EXCLUSIVE MODE"))
+    else:
+        # SQLite has no table locks: a no-op UPDATE takes the database write lock instead
+        await db.execute(update(Account).where(Account.id.is_(None)).values(name=Account.name))
+
+async def _reserve_account_ids(db: AsyncSession, count: int, max_id: int) -> List[int]:
+    """
+    `count` unused account ids in ascending order. PostgreSQL draws them from the
+    id sequence, the same one single inserts use (on a fresh database that gives
+    the standard CoA its well-known ids 1, 61, 81, ...). On SQLite ids follow the
+    highest existing one, which is what its own rowid allocation does; the
+    write lock from `_lock_accounts` keeps them free.
+    """
+    if not count:
+        return []
+    if db.get_bind().dialect.name == "postgresql":
+        result = await db.execute(
+            text("SELECT nextval(pg_get_serial_sequence('accounts', 'id')) FROM generate_series(1, :count)"),
+            {"count": count}
         )
-        db.add(account)
-        await db.flush() # Flush to generate ID without committing transaction
-        await db.refresh(account)
-    
-    # 4. Update Cache
-    if cache is not None:
-        cache[key] = account
-        
-    return account
+        return sorted(result.scalars().all())
+    return list(range(max_id + 1, max_id + 1 + count))
 
 # --- Endpoints ---
 
@@ -69,6 +98,9 @@ async def bulk_upload_accounts(
     """
     Bulk uploads Chart of Accounts from a CSV file.
     Expected Columns: 'Category', 'HEAD', 'Sub head'
+    
+    Set-based: the existing hierarchy is loaded in one query, missing nodes
+    are worked out in memory, and each level is inserted in one batch.
     """
     if not file.filename.endswith('.csv'):
         raise HTTPException(status_code=400, detail="Only CSV files are allowed")
@@ -83,60 +115,41 @@ async def bulk_upload_accounts(
         if not required_cols.issubset(df.columns):
              raise HTTPException(status_code=400, detail=f"CSV must contain columns: {required_cols}")
 
-        # Cache to prevent duplicate DB lookups within this request
-        # Key: (name, type, parent_id) -> Account Object
-        account_cache = {}
+        categories = df['Category'].map(str).str.strip().str.upper().tolist() # e.g., "ASSET"
+        head_names = df['HEAD'].map(str).str.strip().tolist()                 # e.g., "Non Current Assets"
+        sub_head_names = df['Sub head'].map(str).str.strip().tolist()         # e.g., "PPE"
 
+        # 1. Preload the existing hierarchy in one query (under the lock, so it stays current)
+        # Key: (name, type, parent_id) -> Account ID
+        await _lock_accounts(db)
+        result = await db.execute(
+            select(Account.id, Account.name, Account.type, Account.parent_id).order_by(Account.id)
+        )
+        existing: Dict[AccountKey, int] = {}
+        max_id = 0
+        for acc_id, name, acc_type, parent_id in result.all():
+            existing.setdefault((name, acc_type, parent_id), acc_id)
+            max_id = max(max_id, acc_id)
+
+        # 2. Resolve Category -> Head -> Sub-Head for every row in memory
+        builder = _HierarchyBuilder(existing)
         count = 0
-        for _, row in df.iterrows():
-            category_str = str(row['Category']).strip().upper() # e.g., "ASSET"
-            head_name = str(row['HEAD']).strip()                # e.g., "Non Current Assets"
-            sub_head_name = str(row['Sub head']).strip()        # e.g., "PPE"
-
-            # 1. Ensure Root Node (Category) exists
-            # We map "ASSET" -> Name "Assets" for cleaner display, or just use the raw value.
-            # Let's map standard categories to pretty names if possible, else use raw.
-            pretty_names = {
-                "ASSET": "Assets",
-                "LIABILITY": "Liabilities",
-                "EQUITY": "Equity",
-                "INCOME": "Income",
-                "EXPENSE": "Expenses"
-            }
-            root_name = pretty_names.get(category_str, category_str.title())
-
-            root_acc = await get_or_create_account(
-                db, 
-                name=root_name, 
-                acc_type=AccountType.CATEGORY.value, 
-                cat_type=category_str, 
-                parent_id=None,
-                cache=account_cache
-            )
-
-            # 2. Ensure Head Node exists
-            head_acc = await get_or_create_account(
-                db, 
-                name=head_name, 
-                acc_type=AccountType.HEAD.value, 
-                cat_type=category_str, 
-                parent_id=root_acc.id,
-                cache=account_cache
-            )
-
-            # 3. Ensure Sub-Head Node exists
+        for category_str, head_name, sub_head_name in zip(categories, head_names, sub_head_names):
+            root_name = PRETTY_CATEGORY_NAMES.get(category_str, category_str.title())
+            root_id = builder.resolve(root_name, AccountType.CATEGORY.value, category_str, None)
+            head_id = builder.resolve(head_name, AccountType.HEAD.value, category_str, root_id)
+
             if sub_head_name and sub_head_name.lower() != 'nan':
-                await get_or_create_account(
-                    db, 
-                    name=sub_head_name, 
-                    acc_type=AccountType.SUB_HEAD.value, 
-                    cat_type=category_str, 
-                    parent_id=head_acc.id,
-                    cache=account_cache
-                )
+                builder.resolve(sub_head_name, AccountType.SUB_HEAD.value, category_str, head_id)
                 count += 1
 
+        # 3. Reserve real ids (in row order) and insert each level in one batch (parents first for the FK)
+        builder.assign_ids(await _reserve_account_ids(db, builder.new_count, max_id))
+        for acc_type in (AccountType.CATEGORY, AccountType.HEAD, AccountType.SUB_HEAD):
+            await bulk_insert(db, Account, builder.pending[acc_type.value])
+
         await db.commit()
+        bump_coa_version()
         return {"status": "success", "sub_heads_processed": count}
 
     except Exception as e:
@@ -159,6 +172,7 @@ async def create_account(payload: AccountCreate, db: AsyncSession = Depends(get_
     )
     db.add(new_account)
     await db.commit()
+    bump_coa_version()
     await db.refresh(new_account)
     return new_account
 
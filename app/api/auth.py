@@ -6,7 +6,7 @@ from sqlalchemy import select
 from sqlalchemy.orm import selectinload
 from typing import List
 
-from app.core.dependencies import get_db, get_current_user
+from app.core.dependencies import get_db, get_read_db, get_current_user
 from app.models.domain import User, Company, UserRole
 from app.schemas.user_schemas import UserCreate, UserRead, Token, AssignCompanyRequest
 from app.core.security import get_password_hash, verify_password, create_access_token
@@ -53,7 +53,7 @@ async def register(user: UserCreate, db: AsyncSession = Depends(get_db)):
     return created_user
 
 @router.post("/login", response_model=Token)
-async def login(form_data: OAuth2PasswordRequestForm = Depends(), db: AsyncSession = Depends(get_db)):
+async def login(form_data: OAuth2PasswordRequestForm = Depends(), db: AsyncSession = Depends(get_read_db)):
     result = await db.execute(select(User).where(User.username == form_data.username))
     user = result.scalars().first()
     
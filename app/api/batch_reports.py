@@ -0,0 +1,49 @@
+# app/api/batch_reports.py
+from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Optional
+from pydantic import BaseModel
+
+from app.core.dependencies import get_read_db
+from app.services.batch_report_service import get_job, resolve_work_ids, start_batch_job, stream_job_zip
+
+router = APIRouter()
+
+class BatchJobCreate(BaseModel):
+    # Either explicit works, or a company / status filter
+    work_ids: List[int] = []
+    company_id: Optional[int] = None
+    status: Optional[str] = None
+    template_ids: List[int] = []
+    compliance_template_ids: List[int] = []
+    signatory_ids: List[int] = []
+    format: str = "pdf"
+
+@router.post("/")
+async def create_batch_job(payload: BatchJobCreate, db: AsyncSession = Depends(get_read_db)):
+    if not payload.work_ids and payload.company_id is None and not payload.status:
+        raise HTTPException(status_code=400, detail="Give work_ids or a company_id / status filter")
+    if not payload.template_ids and not payload.compliance_template_ids:
+        raise HTTPException(status_code=400, detail="No templates selected")
+
+    work_ids = await resolve_work_ids(db, payload.work_ids, payload.company_id, payload.status)
+    job = await start_batch_job(
+        db, work_ids, payload.template_ids, payload.compliance_template_ids,
+        payload.signatory_ids, payload.format.lower()
+    )
+    return job.progress()
+
+@router.get("/{job_id}")
+async def get_batch_job(job_id: str):
+    return get_job(job_id).progress()
+
+@router.get("/{job_id}/download")
+async def download_batch_job(job_id: str):
+    """Streams the ZIP; may start while the job is still running."""
+    job = get_job(job_id)
+    return StreamingResponse(
+        stream_job_zip(job),
+        media_type="application/zip",
+        headers={"Content-Disposition": f"attachment; filename=batch_{job.id}.zip"}
+    )
@@ -5,8 +5,9 @@ from sqlalchemy import select
 from typing import List
 
 from app.core.dependencies import get_db, get_current_user
-from app.models.domain import Company, User, UserRole
+from app.models.domain import Company, ComplianceTemplate, User, UserRole
 from app.schemas.company_schemas import CompanyCreate, CompanyRead
+from app.services.compliance_service import compile_compliance_template
 from app.utils.default_compliance_templates import DEFAULT_TEMPLATES # <--- Import
 
 router = APIRouter()
@@ -80,6 +81,7 @@ async def seed_default_templates(db: AsyncSession = Depends(get_db)):
     into the database.
     """
     count = 0
+    added = []
     for tmpl_data in DEFAULT_TEMPLATES:
         # Check if exists
         result = await db.execute(select(ComplianceTemplate).where(ComplianceTemplate.name == tmpl_data["name"]))
@@ -91,7 +93,10 @@ async def seed_default_templates(db: AsyncSession = Depends(get_db)):
                 content_html=tmpl_data["content"]
             )
             db.add(new_tmpl)
+            added.append(new_tmpl)
             count += 1
             
     await db.commit()
+    for tmpl in added:
+        compile_compliance_template(tmpl)
     return {"status": "success", "templates_added": count}
\ No newline at end of file
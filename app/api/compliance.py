@@ -1,6 +1,6 @@
 # app/api/compliance.py
 import json
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, Header, HTTPException, Query
 from fastapi.responses import Response
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
@@ -9,7 +9,12 @@ from typing import List, Optional, Any
 
 from app.core.dependencies import get_db
 from app.models.domain import ComplianceTemplate
-from app.services.compliance_service import generate_compliance_doc, html_to_pdf
+from app.services.compliance_service import (
+    ComplianceTemplateError, build_template_source, compile_compliance_template, compliance_cache_key,
+    generate_compliance_doc, write_compliance_pdf
+)
+from app.services.artifact_cache import artifact_cache, etag_for, etag_matches
+from app.utils.streaming import file_response
 from app.utils.default_compliance_templates import DEFAULT_TEMPLATES
 
 router = APIRouter()
@@ -41,6 +46,12 @@ async def list_templates(db: AsyncSession = Depends(get_db)):
 @router.post("/templates")
 async def create_template(payload: TemplateCreate, db: AsyncSession = Depends(get_db)):
     json_def = json.dumps(payload.template_definition) if payload.template_definition else None
+
+    # Template errors surface here, not at download time
+    try:
+        build_template_source(payload.content_html, payload.template_definition or None)
+    except ComplianceTemplateError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     
     tmpl = ComplianceTemplate(
         name=payload.name, 
@@ -49,6 +60,7 @@ async def create_template(payload: TemplateCreate, db: AsyncSession = Depends(ge
     )
     db.add(tmpl)
     await db.commit()
+    compile_compliance_template(tmpl)
     return tmpl
 
 # --- UPDATED PREVIEW/DOWNLOAD ---
@@ -66,6 +78,8 @@ async def preview_document(
     try:
         html = await generate_compliance_doc(db, work_id, template_id, sig_ids_list)
         return {"html": html}
+    except ComplianceTemplateError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except ValueError as e:
         raise HTTPException(status_code=404, detail=str(e))
 
@@ -74,14 +88,28 @@ async def download_document(
     work_id: int, 
     template_id: int, 
     signatory_ids: str = Query(None),
+    if_none_match: Optional[str] = Header(None),
     db: AsyncSession = Depends(get_db)
 ):
     sig_ids_list = [int(x) for x in signatory_ids.split(',')] if signatory_ids else []
     
     try:
-        html = await generate_compliance_doc(db, work_id, template_id, sig_ids_list)
-        pdf_bytes = html_to_pdf(html)
-        return Response(content=pdf_bytes, media_type="application/pdf", headers={"Content-Disposition": "attachment; filename=document.pdf"})
+        key = await compliance_cache_key(db, work_id, template_id, sig_ids_list)
+        await db.commit() # Not held open through a cache hit, a 304 or the render
+        headers = {"ETag": etag_for(key), "Cache-Control": "private, no-cache"}
+        if etag_matches(if_none_match, key):
+            return Response(status_code=304, headers=headers)
+
+        async def render(path):
+            html = await generate_compliance_doc(db, work_id, template_id, sig_ids_list)
+            await db.commit() # Release the connection before the (slow) PDF render
+            await write_compliance_pdf(html, path)
+
+        file = await artifact_cache.open_or_render(key, "pdf", render)
+        headers["Content-Disposition"] = "attachment; filename=document.pdf"
+        return file_response(file, "application/pdf", headers)
+    except ComplianceTemplateError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except ValueError as e:
         raise HTTPException(status_code=404, detail=str(e))
 
@@ -93,6 +121,7 @@ async def seed_default_templates(db: AsyncSession = Depends(get_db)):
     into the database.
     """
     count = 0
+    added = []
     # Iterate over the imported list
     for tmpl_data in DEFAULT_TEMPLATES:
         # Check if exists to avoid duplicates
@@ -105,7 +134,10 @@ async def seed_default_templates(db: AsyncSession = Depends(get_db)):
                 content_html=tmpl_data["content"]
             )
             db.add(new_tmpl)
+            added.append(new_tmpl)
             count += 1
             
     await db.commit()
+    for tmpl in added:
+        compile_compliance_template(tmpl)
     return {"status": "success", "templates_added": count}
@@ -0,0 +1,60 @@
+# app/api/mapping_rules.py
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, or_
+from typing import List, Optional
+
+from app.core.dependencies import get_db
+from app.models.domain import AccountType, Company, MappingRule
+from app.schemas.mapping_rule_schemas import MappingRuleCreate, MappingRuleRead
+from app.services.coa_cache import get_coa_snapshot
+from app.services.mapping_rule_service import RuleCompileError, invalidate_rule_matchers, validate_rule
+
+router = APIRouter()
+
+@router.post("/", response_model=MappingRuleRead)
+async def create_mapping_rule(payload: MappingRuleCreate, db: AsyncSession = Depends(get_db)):
+    # Validate target sub-head & company
+    account = (await get_coa_snapshot(db)).account_map.get(payload.account_sub_head_id)
+    if not account or account.type != AccountType.SUB_HEAD:
+        raise HTTPException(status_code=400, detail="Invalid Account")
+    if payload.company_id and not await db.get(Company, payload.company_id):
+        raise HTTPException(status_code=404, detail="Company not found")
+
+    match_type = payload.match_type.upper()
+    try:
+        validate_rule(match_type, payload.pattern)
+    except RuleCompileError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    rule = MappingRule(
+        company_id=payload.company_id,
+        match_type=match_type,
+        pattern=payload.pattern,
+        account_sub_head_id=payload.account_sub_head_id,
+        priority=payload.priority
+    )
+    db.add(rule)
+    await db.commit()
+    invalidate_rule_matchers()
+    await db.refresh(rule)
+    return rule
+
+@router.get("/", response_model=List[MappingRuleRead])
+async def list_mapping_rules(company_id: Optional[int] = None, db: AsyncSession = Depends(get_db)):
+    """Firm-wide rules, plus the company's own rules when company_id is given."""
+    query = select(MappingRule).order_by(MappingRule.priority, MappingRule.id)
+    if company_id:
+        query = query.where(or_(MappingRule.company_id == company_id, MappingRule.company_id.is_(None)))
+    result = await db.execute(query)
+    return result.scalars().all()
+
+@router.delete("/{rule_id}")
+async def delete_mapping_rule(rule_id: int, db: AsyncSession = Depends(get_db)):
+    rule = await db.get(MappingRule, rule_id)
+    if not rule:
+        raise HTTPException(status_code=404, detail="Rule not found")
+    await db.delete(rule)
+    await db.commit()
+    invalidate_rule_matchers()
+    return {"status": "deleted"}
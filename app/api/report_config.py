@@ -43,5 +43,6 @@ async def update_report_config(
         db.add(config)
     
     config.custom_notes = json.dumps(payload.custom_notes)
+    work.data_revision += 1 # Notes are part of the rendered statements
     await db.commit()
     return {"status": "updated"}
\ No newline at end of file
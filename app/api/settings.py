@@ -34,6 +34,8 @@ async def update_settings(payload: SettingsSchema, db: AsyncSession = Depends(ge
     if not settings:
         settings = OrganizationSettings(id=1)
         db.add(settings)
+    else:
+        settings.revision += 1
     
     settings.firm_name = payload.firm_name
     settings.firm_registration_number = payload.firm_registration_number
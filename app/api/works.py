@@ -3,18 +3,23 @@ import os
 import shutil
 from datetime import datetime
 from typing import List, Optional
-from fastapi import APIRouter, UploadFile, File, Depends, HTTPException, Form
+from fastapi import APIRouter, UploadFile, File, Depends, Header, HTTPException, Form
 from fastapi.responses import Response
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
 from sqlalchemy.orm import selectinload
 from pydantic import BaseModel
 
-from app.core.dependencies import get_db, get_current_user
+from app.core.dependencies import get_db, get_read_db, get_current_user
 from app.models.domain import FinancialWork, TrialBalanceEntry, WorkUnit, User, WorkStatus
 from app.services.trial_balance_service import process_trial_balance_upload
-from app.services.mapping_service import get_unmapped_entries, map_entry_to_account
-from app.services.report_service import generate_report, get_report_data
+from app.services.mapping_service import get_unmapped_entries, map_entry_to_account, map_entries_bulk
+from app.services.suggestion_service import suggest_mappings
+from app.services.report_service import (
+    get_report_data, report_cache_key, report_pack_cache_key, write_report, write_report_pack
+)
+from app.services.artifact_cache import artifact_cache, etag_for, etag_matches
+from app.utils.streaming import file_response
 from app.utils.validators import validate_udin
 
 from app.services.trial_balance_service import process_trial_balance_upload, get_unit_versions, get_tb_totals # <--- Updated Import
@@ -48,6 +53,9 @@ class MappingRequest(BaseModel):
     trial_balance_entry_id: int
     account_sub_head_id: int
 
+class BulkMappingRequest(BaseModel):
+    mappings: List[MappingRequest]
+
 # --- 1. Work Management ---
 
 @router.post("/", response_model=WorkRead)
@@ -155,13 +163,12 @@ async def upload_trial_balance(
     if not file.filename.endswith('.csv'):
         raise HTTPException(status_code=400, detail="Only CSV files are allowed")
         
-    contents = await file.read()
-    
+    # Hand over the spooled upload itself; the service reads it in batches
     result = await process_trial_balance_upload(
         session=db,
         work_id=work_id,
         unit_id=unit_id,
-        file_contents=contents
+        file_contents=file.file
     )
     
     return result
@@ -176,6 +183,16 @@ async def list_unmapped_entries(
     entries = await get_unmapped_entries(db, work_id)
     return entries
 
+@router.get("/{work_id}/mapping-suggestions")
+async def list_mapping_suggestions(
+    work_id: int,
+    top_k: int = 3,
+    db: AsyncSession = Depends(get_db)
+):
+    """Suggested sub-heads (with similarity scores) for each unmapped entry."""
+    entries = await get_unmapped_entries(db, work_id)
+    return await suggest_mappings(db, entries, top_k)
+
 @router.post("/{work_id}/map-entry")
 async def map_entry(
     work_id: int,
@@ -189,6 +206,21 @@ async def map_entry(
     )
     return {"status": "mapped", "mapping_id": mapping.id}
 
+@router.post("/{work_id}/map-entries")
+async def map_entries(
+    work_id: int,
+    payload: BulkMappingRequest,
+    db: AsyncSession = Depends(get_db)
+):
+    """Maps many entries in one request; returns a result per entry."""
+    results = await map_entries_bulk(
+        session=db,
+        work_id=work_id,
+        mappings=[(m.trial_balance_entry_id, m.account_sub_head_id) for m in payload.mappings]
+    )
+    mapped = sum(1 for r in results if r["status"] == "mapped")
+    return {"status": "success", "mapped": mapped, "failed": len(results) - mapped, "results": results}
+
 @router.get("/{work_id}/preview/{template_id}")
 async def preview_statement(
     work_id: int, 
@@ -210,16 +242,61 @@ async def download_statement(
     work_id: int, 
     template_id: int, 
     format: str = "pdf",
+    if_none_match: Optional[str] = Header(None),
     db: AsyncSession = Depends(get_db)
 ):
-    file_bytes, filename = await generate_report(db, work_id, template_id, format)
+    # Identical inputs give identical bytes: answer from the ETag or the artifact cache when possible
+    key = await report_cache_key(db, work_id, template_id, format)
+    await db.commit() # Not held open through a cache hit, a 304 or the render
+    headers = {"ETag": etag_for(key), "Cache-Control": "private, no-cache"}
+    if etag_matches(if_none_match, key):
+        return Response(status_code=304, headers=headers)
+
+    # Rendered straight to disk and streamed back in chunks
+    file = await artifact_cache.open_or_render(
+        key, format, lambda path: write_report(db, work_id, template_id, format, path)
+    )
+
+    filename = f"Report_{work_id}.{format}"
     media_type = "application/pdf" if format == "pdf" else "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
-    return Response(
-        content=file_bytes,
-        media_type=media_type,
-        headers={"Content-Disposition": f"attachment; filename={filename}"}
+    headers["Content-Disposition"] = f"attachment; filename={filename}"
+    return file_response(file, media_type, headers)
+
+class ReportPackRequest(BaseModel):
+    template_ids: List[int]
+    compliance_template_ids: List[int] = []
+    signatory_ids: List[int] = []
+    format: str = "pdf"
+
+@router.post("/{work_id}/report-pack")
+async def download_report_pack(
+    work_id: int,
+    payload: ReportPackRequest,
+    if_none_match: Optional[str] = Header(None),
+    db: AsyncSession = Depends(get_read_db)
+):
+    """
+    Balance Sheet, P&L, Cash Flow... (plus compliance documents in the PDF)
+    as one file, with balances computed once and notes numbered across statements.
+    """
+    if not payload.template_ids and not payload.compliance_template_ids:
+        raise HTTPException(status_code=400, detail="Nothing to render")
+    args = (payload.template_ids, payload.compliance_template_ids, payload.signatory_ids, payload.format)
+
+    key = await report_pack_cache_key(db, work_id, *args)
+    await db.commit() # Not held open through a cache hit, a 304 or the render
+    headers = {"ETag": etag_for(key), "Cache-Control": "private, no-cache"}
+    if etag_matches(if_none_match, key):
+        return Response(status_code=304, headers=headers)
+
+    file = await artifact_cache.open_or_render(
+        key, payload.format, lambda path: write_report_pack(db, work_id, *args, path)
     )
 
+    media_type = "application/pdf" if payload.format == "pdf" else "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+    headers["Content-Disposition"] = f"attachment; filename=Annual_Report_{work_id}.{payload.format}"
+    return file_response(file, media_type, headers)
+
 # --- 4. Finalization & Compliance (NEW) ---
 
 @router.post("/{work_id}/finalize")
@@ -253,6 +330,7 @@ async def finalize_work(
     work.signing_date = datetime.strptime(signing_date, "%Y-%m-%d").date()
     work.udin_certificate_url = file_location
     work.status = WorkStatus.FINALIZED.value
+    work.data_revision += 1 # Drops the DRAFT watermark from cached statements
     
     await db.commit()
     return {"status": "success", "work_status": "FINALIZED"}
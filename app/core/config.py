@@ -5,6 +5,41 @@ class Settings(BaseSettings):
     APP_ENV: str = "development"
     SECRET_KEY: str = "changeme"
 
+    # PostgreSQL pool (see app/core/database.py); ignored for SQLite
+    DB_POOL_SIZE: int = 10
+    DB_MAX_OVERFLOW: int = 10
+    DB_POOL_TIMEOUT: float = 30.0
+    DB_POOL_RECYCLE: int = 1800
+    DB_POOL_PRE_PING: bool = True
+    DB_STATEMENT_CACHE_SIZE: int = 256
+    DB_STATEMENT_TIMEOUT_MS: int = 30000
+    DB_BULK_STATEMENT_TIMEOUT_MS: int = 600000
+
+    # SQLite production mode (see app/core/database.py); off = plain dev profile
+    SQLITE_PRODUCTION: bool = False
+    SQLITE_READ_POOL_SIZE: int = 8
+    SQLITE_WRITE_QUEUE_TIMEOUT: float = 300.0
+    SQLITE_BUSY_TIMEOUT_MS: int = 5000
+    SQLITE_CACHE_SIZE: int = -65536 # negative = KiB (64 MiB)
+    SQLITE_MMAP_SIZE: int = 268435456
+
+    # PDF rendering (see app/services/pdf_renderer.py)
+    PDF_RENDER_WORKERS: int = 2
+    PDF_RENDER_CONCURRENCY: int = 2
+    PDF_RENDER_TIMEOUT: float = 120.0
+
+    # Jinja (see app/services/template_engine.py); empty dir disables the bytecode cache
+    TEMPLATE_CACHE_SIZE: int = 256
+    JINJA_BYTECODE_CACHE_DIR: str = ""
+
+    # Rendered PDF/XLSX cache (see app/services/artifact_cache.py); empty dir disables it
+    ARTIFACT_CACHE_DIR: str = "./artifact_cache"
+    ARTIFACT_CACHE_MAX_BYTES: int = 512 * 1024 * 1024
+
+    # Batch generation (see app/services/batch_report_service.py)
+    BATCH_REPORT_CONCURRENCY: int = 4
+    BATCH_JOB_TTL: int = 3600
+
     class Config:
         env_file = ".env"
 
@@ -0,0 +1,108 @@
+# app/core/database.py
+"""
+Engine construction for the database profiles:
+  - SQLite (aiosqlite): the development default; SQLAlchemy's pool defaults.
+  - SQLite production mode (SQLITE_PRODUCTION): for small single-server
+    deployments. Every connection runs in WAL mode with tuned pragmas, and
+    reads and writes get separate engines: a pool of query_only read
+    connections, and one write connection that write requests queue for
+    (first come, first served), so concurrent writers wait their turn
+    instead of failing with "database is locked".
+  - PostgreSQL (asyncpg): production. Pool sized by DB_POOL_*, stale
+    connections dropped by pre-ping/recycle, asyncpg's prepared statement cache
+    sized by DB_STATEMENT_CACHE_SIZE and every statement bounded by
+    DB_STATEMENT_TIMEOUT_MS.
+"""
+from typing import Tuple
+from sqlalchemy import event, text
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, create_async_engine
+
+from app.core.config import settings
+
+def async_database_url(url: str) -> str:
+    """Plain postgres:// URLs (as handed out by hosting providers) get the asyncpg driver."""
+    for prefix in ("postgres://", "postgresql://", "postgresql+psycopg2://"):
+        if url.startswith(prefix):
+            return "postgresql+asyncpg://" + url[len(prefix):]
+    return url
+
+def build_engines(url: str) -> Tuple[AsyncEngine, AsyncEngine]:
+    """(read engine, write engine); one shared engine except in SQLite production mode."""
+    if settings.SQLITE_PRODUCTION and make_url(url).get_backend_name() == "sqlite":
+        return _build_sqlite_engine(url, writer=False), _build_sqlite_engine(url, writer=True)
+    engine = build_engine(url)
+    return engine, engine
+
+def build_engine(url: str) -> AsyncEngine:
+    url = async_database_url(url)
+    if make_url(url).get_backend_name() != "postgresql":
+        return create_async_engine(url, future=True, echo=False)
+
+    return create_async_engine(
+        url,
+        future=True,
+        echo=False,
+        pool_size=settings.DB_POOL_SIZE,
+        max_overflow=settings.DB_MAX_OVERFLOW,
+        pool_timeout=settings.DB_POOL_TIMEOUT,
+        pool_recycle=settings.DB_POOL_RECYCLE,
+        pool_pre_ping=settings.DB_POOL_PRE_PING,
+        connect_args={
+            # Per-connection cache of server-side prepared statements.
+            # Set to 0 behind PgBouncer in transaction pooling mode.
+            "prepared_statement_cache_size": settings.DB_STATEMENT_CACHE_SIZE,
+            "server_settings": {
+                "application_name": "finstat",
+                "statement_timeout": str(settings.DB_STATEMENT_TIMEOUT_MS),
+            },
+        },
+    )
+
+def _build_sqlite_engine(url: str, writer: bool) -> AsyncEngine:
+    if writer:
+        # The single write connection: checking it out is the writer queue
+        engine = create_async_engine(
+            url, future=True, echo=False,
+            pool_size=1, max_overflow=0, pool_timeout=settings.SQLITE_WRITE_QUEUE_TIMEOUT
+        )
+    else:
+        engine = create_async_engine(
+            url, future=True, echo=False,
+            pool_size=settings.SQLITE_READ_POOL_SIZE, max_overflow=0, pool_timeout=settings.DB_POOL_TIMEOUT
+        )
+
+    @event.listens_for(engine.sync_engine, "connect")
+    def _apply_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        # WAL: readers never block the writer and vice versa; NORMAL is durable at every checkpoint
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute("PRAGMA synchronous=NORMAL")
+        cursor.execute(f"PRAGMA busy_timeout={int(settings.SQLITE_BUSY_TIMEOUT_MS)}")
+        cursor.execute(f"PRAGMA cache_size={int(settings.SQLITE_CACHE_SIZE)}")
+        cursor.execute(f"PRAGMA mmap_size={int(settings.SQLITE_MMAP_SIZE)}")
+        if not writer:
+            # A write slipping onto a read connection fails loudly instead of racing the writer
+            cursor.execute("PRAGMA query_only=ON")
+        cursor.close()
+
+    return engine
+
+async def set_statement_timeout(session: AsyncSession, timeout_ms: int):
+    """
+    Overrides the statement timeout for the rest of the session's current
+    transaction (e.g. a large upload). No-op outside PostgreSQL.
+    """
+    if session.get_bind().dialect.name == "postgresql":
+        await session.execute(text(f"SET LOCAL statement_timeout = {int(timeout_ms)}"))
+
+def pool_stats(engine: AsyncEngine) -> dict:
+    """Current pool usage, for sizing DB_POOL_SIZE / DB_MAX_OVERFLOW."""
+    pool = engine.pool
+    stats = {"dialect": engine.dialect.name, "pool": type(pool).__name__, "status": pool.status()}
+    # QueuePool counters; SQLite's dev pools may not have all of them
+    for name in ("size", "checkedin", "checkedout", "overflow"):
+        counter = getattr(pool, name, None)
+        if counter is not None:
+            stats[name] = counter()
+    return stats
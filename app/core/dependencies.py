@@ -1,26 +1,36 @@
 # app/core/dependencies.py
-from fastapi import Depends, HTTPException, status
+from fastapi import Depends, HTTPException, Request, status
 from fastapi.security import OAuth2PasswordBearer
 from jose import JWTError, jwt
-from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import sessionmaker, selectinload
 from sqlalchemy import select
 
 from app.core.config import settings
+from app.core.database import build_engines
 from app.core.security import SECRET_KEY, ALGORITHM
 from app.models.domain import User
 
-# DB Setup
-engine = create_async_engine(settings.DATABASE_URL, future=True, echo=False)
+# DB Setup (SQLite in development, pooled asyncpg in production; see app/core/database.py)
+# `engine` serves reads; `write_engine` is the same engine except in SQLite production mode
+engine, write_engine = build_engines(settings.DATABASE_URL)
 AsyncSessionLocal = sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+WriteSessionLocal = sessionmaker(write_engine, class_=AsyncSession, expire_on_commit=False)
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/auth/login")
 
-async def get_db():
+async def get_db(request: Request):
+    # GET/HEAD handlers only read; everything else may write and goes through the writer
+    factory = AsyncSessionLocal if request.method in ("GET", "HEAD") else WriteSessionLocal
+    async with factory() as session:
+        yield session
+
+async def get_read_db():
+    # For non-GET handlers that only read (login, report downloads), so they never hold the writer
     async with AsyncSessionLocal() as session:
         yield session
 
-async def get_current_user(token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_db)) -> User:
+async def get_current_user(token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_read_db)) -> User:
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
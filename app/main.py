@@ -1,5 +1,5 @@
 # app/main.py
-from fastapi import FastAPI
+from fastapi import Depends, FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
 # Import all routers
@@ -12,9 +12,15 @@ from app.api import (
     report_config, 
     signatories,
     settings,     # <--- Phase 4: Firm Settings
-    compliance    # <--- Phase 4: Document Generation (THIS WAS LIKELY MISSING)
+    compliance,   # <--- Phase 4: Document Generation (THIS WAS LIKELY MISSING)
+    mapping_rules,
+    batch_reports
 )
 from app.core.config import settings as app_settings
+from app.core.database import pool_stats
+from app.core.dependencies import engine, get_current_user, write_engine
+from app.models.domain import User
+from app.services.pdf_renderer import shutdown_renderer
 
 app = FastAPI(title="Finstat - Financial Tool Pro")
 
@@ -35,11 +41,26 @@ app.include_router(works.router, prefix="/works", tags=["works"])
 app.include_router(accounts.router, prefix="/accounts", tags=["accounts"])
 app.include_router(templates.router, prefix="/templates", tags=["templates"])
 app.include_router(report_config.router, prefix="/reports", tags=["reports"])
+app.include_router(mapping_rules.router, prefix="/mapping-rules", tags=["mapping-rules"])
+app.include_router(batch_reports.router, prefix="/batch-reports", tags=["batch-reports"])
 
 # Phase 4 New Routers
 app.include_router(settings.router, prefix="/settings", tags=["settings"])
 app.include_router(compliance.router, prefix="/compliance", tags=["compliance"]) # <--- CRITICAL FIX
 
+@app.on_event("shutdown")
+def stop_pdf_renderer():
+    shutdown_renderer()
+
+@app.get('/health/db')
+async def database_pool(current_user: User = Depends(get_current_user)):
+    """Connection pool usage, for sizing DB_POOL_SIZE / DB_MAX_OVERFLOW (signed-in users only)."""
+    stats = pool_stats(engine)
+    if write_engine is not engine:
+        # SQLite production mode: requests waiting for the writer show up as checked-out/queued here
+        stats["writer"] = pool_stats(write_engine)
+    return stats
+
 @app.get('/')
 async def hello():
     return {"msg": "Finstat API is running", "env": app_settings.APP_ENV}
\ No newline at end of file
@@ -1,7 +1,7 @@
 # app/models/domain.py
 import enum
 from sqlalchemy import (
-    Column, Integer, String, ForeignKey, Numeric, Date, Text, Table, Boolean
+    Column, Integer, String, ForeignKey, Numeric, Date, Text, Table, Boolean, Index
 )
 from sqlalchemy.orm import declarative_base, relationship
 
@@ -47,6 +47,12 @@ class AccountType(str, enum.Enum):
     HEAD = 'HEAD'
     SUB_HEAD = 'SUB_HEAD'
 
+class MappingRuleType(str, enum.Enum):
+    EXACT = 'EXACT'
+    PREFIX = 'PREFIX'
+    KEYWORD = 'KEYWORD'
+    REGEX = 'REGEX'
+
 class CategoryType(str, enum.Enum):
     ASSET = 'ASSET'
     LIABILITY = 'LIABILITY'
@@ -97,7 +103,7 @@ class Company(Base):
 class Signatory(Base):
     __tablename__ = "signatories"
     id = Column(Integer, primary_key=True, index=True)
-    company_id = Column(Integer, ForeignKey("companies.id"), nullable=False)
+    company_id = Column(Integer, ForeignKey("companies.id"), nullable=False, index=True)
     
     name = Column(String, nullable=False)
     designation = Column(String, nullable=False) # Use Designation Enum
@@ -116,6 +122,10 @@ class Signatory(Base):
 
 class FinancialWork(Base):
     __tablename__ = "financial_works"
+    __table_args__ = (
+        # Works of a company; also the prior-year lookup (company, end_date < x, latest first)
+        Index("ix_financial_works_company_end_date", "company_id", "end_date"),
+    )
     id = Column(Integer, primary_key=True, index=True)
     company_id = Column(Integer, ForeignKey("companies.id"), nullable=False)
     
@@ -127,6 +137,9 @@ class FinancialWork(Base):
     signing_date = Column(Date, nullable=True)
     udin_number = Column(String, nullable=True)
     udin_certificate_url = Column(String, nullable=True)
+
+    # Bumped with every change to the work's statement data (see artifact_cache)
+    data_revision = Column(Integer, nullable=False, default=1, server_default="1")
     
     company = relationship("Company", back_populates="works")
     units = relationship("WorkUnit", back_populates="work")
@@ -138,14 +151,23 @@ class WorkUnit(Base):
     """
     __tablename__ = "work_units"
     id = Column(Integer, primary_key=True, index=True)
-    financial_work_id = Column(Integer, ForeignKey("financial_works.id"), nullable=False)
+    financial_work_id = Column(Integer, ForeignKey("financial_works.id"), nullable=False, index=True)
     unit_name = Column(String, nullable=False, default="Main")
     
+    # Latest uploaded TB version; maintained by process_trial_balance_upload (NULL = no upload yet)
+    current_version = Column(Integer, nullable=True)
+    # Version counter; bumped (under the row lock) when an upload starts, see allocate_version
+    last_allocated_version = Column(Integer, nullable=False, default=0, server_default="0")
+    
     work = relationship("FinancialWork", back_populates="units")
     trial_balance_entries = relationship("TrialBalanceEntry", back_populates="unit")
 
 class TrialBalanceEntry(Base):
     __tablename__ = "trial_balance_entries"
+    __table_args__ = (
+        # Every TB read is "one version of one unit"
+        Index("ix_trial_balance_entries_unit_version", "work_unit_id", "version_number"),
+    )
     id = Column(Integer, primary_key=True, index=True)
     
     # Linked to Unit now, not directly to Work
@@ -169,7 +191,7 @@ class Account(Base):
     type = Column(String, nullable=False)
     category_type = Column(String, nullable=False)
     
-    parent_id = Column(Integer, ForeignKey('accounts.id'), nullable=True)
+    parent_id = Column(Integer, ForeignKey('accounts.id'), nullable=True, index=True)
     children = relationship("Account", back_populates="parent")
     parent = relationship("Account", back_populates="children", remote_side=[id])
 
@@ -182,6 +204,31 @@ class MappedLedgerEntry(Base):
     trial_balance_entry = relationship("TrialBalanceEntry", back_populates="mapping")
     account_sub_head = relationship("Account")
 
+class MappingRule(Base):
+    """
+    Auto-mapping rule: ledger names matching `pattern` go to a sub-head.
+    company_id NULL means the rule applies firm-wide; company rules win over
+    firm-wide ones, then lower priority, then older rules.
+    """
+    __tablename__ = "mapping_rules"
+    id = Column(Integer, primary_key=True, index=True)
+    company_id = Column(Integer, ForeignKey("companies.id"), nullable=True, index=True)
+    match_type = Column(String, nullable=False) # Use MappingRuleType Enum
+    pattern = Column(String, nullable=False)
+    account_sub_head_id = Column(Integer, ForeignKey("accounts.id"), nullable=False)
+    priority = Column(Integer, nullable=False, default=100)
+
+class WorkUnitBalance(Base):
+    """
+    Materialized sum of mapped closing balances per sub-head for the current
+    TB version of a unit. Maintained incrementally by the upload and mapping
+    services (see balance_snapshot_service) so statements read pre-aggregated rows.
+    """
+    __tablename__ = "work_unit_balances"
+    work_unit_id = Column(Integer, ForeignKey("work_units.id"), primary_key=True)
+    account_sub_head_id = Column(Integer, ForeignKey("accounts.id"), primary_key=True)
+    amount = Column(Numeric(18, 2), nullable=False, default=0)
+
 class ReportTemplate(Base):
     __tablename__ = "report_templates"
     id = Column(Integer, primary_key=True, index=True)
@@ -190,6 +237,7 @@ class ReportTemplate(Base):
     # Smart Format: Auto-suggest based on client type
     applicable_client_types = Column(Text, nullable=True) # JSON list of types, e.g. ["PVT_LTD", "LLP"]
     template_definition = Column(Text, nullable=False)
+    revision = Column(Integer, nullable=False, default=1, server_default="1")
 
 class WorkReportConfiguration(Base):
     __tablename__ = "work_report_configurations"
@@ -214,6 +262,7 @@ class OrganizationSettings(Base):
     email = Column(String, nullable=True)
     pan = Column(String, nullable=True)  # <--- NEW FIELD
     logo_url = Column(String, nullable=True)
+    revision = Column(Integer, nullable=False, default=1, server_default="1")
     
 class ComplianceTemplate(Base):
     __tablename__ = "compliance_templates"
@@ -222,4 +271,6 @@ class ComplianceTemplate(Base):
     content_html = Column(Text, nullable=True) # Legacy support
     
     # NEW: Stores JSON list of blocks e.g. [{"type": "text", "content": "..."}, {"type": "signatories"}]
-    template_definition = Column(Text, nullable=True)
\ No newline at end of file
+    template_definition = Column(Text, nullable=True)
+    # Bumped on every change; compiled templates are cached per (id, revision)
+    revision = Column(Integer, nullable=False, default=1, server_default="1")
\ No newline at end of file
@@ -0,0 +1,16 @@
+# app/schemas/mapping_rule_schemas.py
+from pydantic import BaseModel
+from typing import Optional
+
+class MappingRuleCreate(BaseModel):
+    company_id: Optional[int] = None # None = firm-wide
+    match_type: str                  # EXACT / PREFIX / KEYWORD / REGEX
+    pattern: str
+    account_sub_head_id: int
+    priority: int = 100
+
+class MappingRuleRead(MappingRuleCreate):
+    id: int
+
+    class Config:
+        from_attributes = True
@@ -0,0 +1,178 @@
+# app/services/artifact_cache.py
+"""
+Content-addressed on-disk cache for rendered documents (PDF / XLSX).
+An artifact's key is a digest of everything that decides its bytes
+(work data revision, template revision, settings revision, signatories,
+format, ...), so entries never need invalidating: a change produces a new
+key and the old file simply ages out. The key doubles as the HTTP ETag.
+Files are evicted least-recently-used once ARTIFACT_CACHE_MAX_BYTES is exceeded.
+Artifacts are rendered straight into the cache directory and handed out as
+open files, so downloads stream from disk instead of holding the bytes.
+"""
+import hashlib
+import json
+import os
+import tempfile
+from typing import Awaitable, BinaryIO, Callable, Optional
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import update
+
+from app.core.config import settings
+from app.models.domain import FinancialWork
+
+# Bump when rendering code changes in a way that alters output for the same inputs
+CACHE_FORMAT_VERSION = 1
+
+def make_key(**parts) -> str:
+    """Digest of the inputs of one artifact; parts must be JSON-serializable."""
+    parts["cache_format"] = CACHE_FORMAT_VERSION
+    payload = json.dumps(parts, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+def etag_for(key: str) -> str:
+    return f'"{key}"'
+
+def etag_matches(if_none_match: Optional[str], key: str) -> bool:
+    """True when the client's If-None-Match already names this artifact."""
+    if not if_none_match:
+        return False
+    tags = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+    return "*" in tags or etag_for(key) in tags
+
+class ArtifactCache:
+    def __init__(self, directory: str, max_bytes: int):
+        self.directory = directory
+        self.max_bytes = max_bytes
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.directory)
+
+    def _path(self, key: str, ext: str) -> str:
+        return os.path.join(self.directory, key[:2], f"{key}.{ext}")
+
+    def get(self, key: str, ext: str) -> Optional[str]:
+        """Path of the cached file, or None. A hit refreshes its LRU position."""
+        if not self.enabled:
+            return None
+        path = self._path(key, ext)
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            return None
+        return path
+
+    def open(self, key: str, ext: str) -> Optional[BinaryIO]:
+        """
+        The cached file opened for reading, or None. Once open it stays readable
+        even if eviction unlinks it before the download finishes.
+        """
+        path = self.get(key, ext)
+        if path is None:
+            return None
+        try:
+            return open(path, "rb")
+        except FileNotFoundError: # Evicted by another worker in between
+            return None
+
+    def read(self, key: str, ext: str) -> Optional[bytes]:
+        f = self.open(key, ext)
+        if f is None:
+            return None
+        with f:
+            return f.read()
+
+    def put(self, key: str, ext: str, content: bytes) -> Optional[str]:
+        """Stores an artifact atomically (readers never see partial files)."""
+        if not self.enabled:
+            return None
+        path, tmp_path = self._reserve(key, ext)
+        try:
+            with open(tmp_path, "wb") as f:
+                f.write(content)
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+        self.evict()
+        return path
+
+    async def open_or_render(self, key: str, ext: str, render: Callable[[str], Awaitable[None]]) -> BinaryIO:
+        """
+        The artifact opened for reading. On a miss `render(path)` writes it to a
+        temporary path that is then published atomically. With the cache disabled
+        the output goes to an anonymous temp file that disappears once closed.
+        """
+        cached = self.open(key, ext)
+        if cached is not None:
+            return cached
+
+        if not self.enabled:
+            f = tempfile.NamedTemporaryFile(suffix=f".{ext}")
+            try:
+                await render(f.name)
+            except BaseException:
+                f.close()
+                raise
+            return f
+
+        path, tmp_path = self._reserve(key, ext)
+        try:
+            await render(tmp_path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+        # Opened before publishing, so eviction cannot pull it away in between
+        f = open(tmp_path, "rb")
+        os.replace(tmp_path, path)
+        self.evict()
+        return f
+
+    def _reserve(self, key: str, ext: str):
+        """Final path of an artifact, plus a fresh temp path next to it."""
+        path = self._path(key, ext)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        os.close(fd)
+        return path, tmp_path
+
+    def evict(self):
+        """Deletes least-recently-used files until the cache fits its size cap."""
+        files = []
+        total = 0
+        for root, _, names in os.walk(self.directory):
+            for name in names:
+                if name.endswith(".tmp"):
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                files.append((stat.st_mtime, stat.st_size, path))
+                total += stat.st_size
+        if total <= self.max_bytes:
+            return
+
+        files.sort()
+        for _, size, path in files:
+            try:
+                os.unlink(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+            if total <= self.max_bytes:
+                break
+
+artifact_cache = ArtifactCache(settings.ARTIFACT_CACHE_DIR, settings.ARTIFACT_CACHE_MAX_BYTES)
+
+async def bump_work_revision(session: AsyncSession, work_id: int):
+    """
+    Marks everything rendered for this work as stale. Call in the same
+    transaction as any change to the work's statement data.
+    """
+    await session.execute(
+        update(FinancialWork)
+        .where(FinancialWork.id == work_id)
+        .values(data_revision=FinancialWork.data_revision + 1)
+    )
@@ -0,0 +1,95 @@
+# app/services/balance_snapshot_service.py
+from decimal import Decimal
+from typing import Dict, Optional, Tuple, Union
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, insert, update, delete, func
+from sqlalchemy.dialects import postgresql, sqlite
+from app.models.domain import MappedLedgerEntry, TrialBalanceEntry, WorkUnit, WorkUnitBalance
+
+# (work_unit_id, account_sub_head_id) -> amount to add
+BalanceDeltas = Dict[Tuple[int, int], Union[Decimal, float]]
+
+async def refresh_unit_balances(session: AsyncSession, unit_id: int, version_number: int):
+    """
+    Replaces a unit's whole contribution with the aggregate of `version_number`.
+    Used when a new TB version becomes current. Runs in the caller's transaction.
+    """
+    await session.execute(delete(WorkUnitBalance).where(WorkUnitBalance.work_unit_id == unit_id))
+    await session.execute(
+        insert(WorkUnitBalance).from_select(
+            ["work_unit_id", "account_sub_head_id", "amount"],
+            select(
+                TrialBalanceEntry.work_unit_id,
+                MappedLedgerEntry.account_sub_head_id,
+                func.sum(TrialBalanceEntry.closing_balance)
+            )
+            .join(MappedLedgerEntry, MappedLedgerEntry.trial_balance_entry_id == TrialBalanceEntry.id)
+            .where(
+                TrialBalanceEntry.work_unit_id == unit_id,
+                TrialBalanceEntry.version_number == version_number
+            )
+            .group_by(TrialBalanceEntry.work_unit_id, MappedLedgerEntry.account_sub_head_id)
+        )
+    )
+
+async def lock_units(session: AsyncSession, *criteria) -> Dict[int, Optional[int]]:
+    """
+    Row-locks the work units matching `criteria` until the caller's transaction
+    ends and returns {unit_id: current_version}. Every writer of a unit's mappings
+    or balance snapshot takes this lock first (uploads hold it from
+    `allocate_version`), so the current version and the existing mappings read
+    afterwards cannot change before the deltas computed from them are applied.
+    Units are locked in id order, so bulk callers cannot deadlock each other.
+    """
+    if session.get_bind().dialect.name == "sqlite":
+        # No row locks (FOR UPDATE is dropped): a no-op UPDATE takes the database write lock instead
+        await session.execute(
+            update(WorkUnit).where(*criteria).values(current_version=WorkUnit.current_version)
+        )
+    result = await session.execute(
+        select(WorkUnit.id, WorkUnit.current_version)
+        .where(*criteria)
+        .order_by(WorkUnit.id)
+        .with_for_update()
+    )
+    return dict(result.all())
+
+async def apply_balance_deltas(session: AsyncSession, deltas: BalanceDeltas):
+    """
+    Adds each delta to its (unit, sub-head) row, creating missing rows, in one
+    INSERT .. ON CONFLICT DO UPDATE (atomic per row on SQLite and PostgreSQL).
+    """
+    params = [
+        {"work_unit_id": unit_id, "account_sub_head_id": sub_head_id, "amount": amount}
+        for (unit_id, sub_head_id), amount in deltas.items() if amount
+    ]
+    if not params:
+        return
+
+    dialect = postgresql if session.get_bind().dialect.name == "postgresql" else sqlite
+    stmt = dialect.insert(WorkUnitBalance.__table__)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["work_unit_id", "account_sub_head_id"],
+        set_={"amount": WorkUnitBalance.__table__.c.amount + stmt.excluded.amount}
+    )
+    await session.execute(stmt, params)
+
+def add_mapping_delta(
+    deltas: BalanceDeltas,
+    entry: TrialBalanceEntry,
+    current_version: Optional[int],
+    old_sub_head_id: Optional[int],
+    new_sub_head_id: int
+):
+    """
+    Records the move of one entry's amount from its old sub-head to the new one.
+    Entries of superseded versions do not count towards the snapshot.
+    """
+    if entry.version_number != current_version or old_sub_head_id == new_sub_head_id:
+        return
+    amount = entry.closing_balance or 0
+    if old_sub_head_id is not None:
+        key = (entry.work_unit_id, old_sub_head_id)
+        deltas[key] = deltas.get(key, 0) - amount
+    key = (entry.work_unit_id, new_sub_head_id)
+    deltas[key] = deltas.get(key, 0) + amount
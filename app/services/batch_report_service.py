@@ -0,0 +1,275 @@
+# app/services/batch_report_service.py
+"""
+Filing-season batch generation: statements and compliance PDFs for many
+works, rendered by a pool of concurrent workers (each with its own DB
+session; PDFs still go through the bounded renderer pool) into a job
+directory, then streamed out as one ZIP.
+Jobs live in this process's memory; finished jobs and their files are
+dropped after BATCH_JOB_TTL seconds.
+"""
+import asyncio
+import os
+import re
+import shutil
+import tempfile
+import time
+import uuid
+import zipfile
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+from fastapi import HTTPException
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select
+
+from app.core.config import settings
+from app.core.dependencies import AsyncSessionLocal
+from app.models.domain import Company, ComplianceTemplate, FinancialWork, ReportTemplate
+from app.services.artifact_cache import artifact_cache
+from app.services.compliance_service import compliance_cache_key, generate_compliance_doc, write_compliance_pdf
+from app.services.report_service import report_cache_key, write_report
+from app.utils.streaming import CHUNK_SIZE
+
+class BatchJob:
+    def __init__(self, work_ids: List[int], tasks: List[Tuple], format: str, signatory_ids: List[int]):
+        self.id = uuid.uuid4().hex
+        self.work_ids = work_ids
+        self.tasks = tasks # (work_id, kind, template_id, archive name)
+        self.format = format
+        self.signatory_ids = signatory_ids
+        self.status = "PENDING"
+        self.completed = 0
+        self.failed = 0
+        self.errors: List[dict] = []
+        self.files: List[Tuple[str, str]] = [] # (archive name, path) in completion order
+        self.directory = tempfile.mkdtemp(prefix="batch_")
+        self.created_at = time.time()
+        self.finished_at: Optional[float] = None
+        self._changed = asyncio.Condition()
+
+    @property
+    def done(self) -> bool:
+        return self.status in ("DONE", "FAILED")
+
+    def progress(self) -> dict:
+        return {
+            "job_id": self.id,
+            "status": self.status,
+            "works": len(self.work_ids),
+            "total": len(self.tasks),
+            "completed": self.completed,
+            "failed": self.failed,
+            "errors": self.errors
+        }
+
+    async def _notify(self):
+        async with self._changed:
+            self._changed.notify_all()
+
+    async def wait_for_change(self):
+        async with self._changed:
+            await self._changed.wait()
+
+_jobs: Dict[str, BatchJob] = {}
+# Strong references to running jobs (the event loop only keeps weak ones)
+_running: set = set()
+
+def _safe_name(text: str) -> str:
+    return re.sub(r"[^A-Za-z0-9._-]+", "_", text or "").strip("_")[:60] or "unnamed"
+
+def _unique_arcname(stem: str, ext: str, used: set) -> str:
+    """`stem.ext`, or `stem_2.ext`, `stem_3.ext`, ... if taken (extractors overwrite duplicate entries)."""
+    arcname, n = f"{stem}.{ext}", 2
+    while arcname.lower() in used:
+        arcname, n = f"{stem}_{n}.{ext}", n + 1
+    used.add(arcname.lower())
+    return arcname
+
+def _prune_jobs():
+    now = time.time()
+    for job_id, job in list(_jobs.items()):
+        if job.done and now - job.finished_at > settings.BATCH_JOB_TTL:
+            shutil.rmtree(job.directory, ignore_errors=True)
+            del _jobs[job_id]
+
+def get_job(job_id: str) -> BatchJob:
+    _prune_jobs()
+    job = _jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Batch job not found")
+    return job
+
+async def resolve_work_ids(
+    session: AsyncSession,
+    work_ids: Optional[List[int]],
+    company_id: Optional[int],
+    status: Optional[str]
+) -> List[int]:
+    """Explicit ids win; otherwise every work matching the company/status filters."""
+    query = select(FinancialWork.id).order_by(FinancialWork.id)
+    if work_ids:
+        query = query.where(FinancialWork.id.in_(work_ids))
+    if company_id is not None:
+        query = query.where(FinancialWork.company_id == company_id)
+    if status:
+        query = query.where(FinancialWork.status == status.upper())
+    return list((await session.execute(query)).scalars().all())
+
+async def start_batch_job(
+    session: AsyncSession,
+    work_ids: List[int],
+    template_ids: List[int],
+    compliance_template_ids: List[int],
+    signatory_ids: List[int],
+    format: str
+) -> BatchJob:
+    if format not in ("pdf", "xlsx"):
+        raise HTTPException(status_code=400, detail="Unsupported format")
+    if not work_ids:
+        raise HTTPException(status_code=400, detail="No works selected")
+    _prune_jobs()
+
+    # Names for the archive entries
+    works = (await session.execute(
+        select(FinancialWork.id, FinancialWork.end_date, Company.legal_name)
+        .join(Company, FinancialWork.company_id == Company.id)
+        .where(FinancialWork.id.in_(work_ids))
+    )).all()
+    report_names = dict((await session.execute(
+        select(ReportTemplate.id, ReportTemplate.name).where(ReportTemplate.id.in_(template_ids))
+    )).all()) if template_ids else {}
+    compliance_names = dict((await session.execute(
+        select(ComplianceTemplate.id, ComplianceTemplate.name).where(ComplianceTemplate.id.in_(compliance_template_ids))
+    )).all()) if compliance_template_ids else {}
+    missing = [i for i in template_ids if i not in report_names] + [i for i in compliance_template_ids if i not in compliance_names]
+    if missing:
+        raise HTTPException(status_code=404, detail=f"Templates not found: {missing}")
+
+    tasks = []
+    notes = []
+    used_names = set()
+    requested = [("statement", i, report_names[i], format) for i in template_ids]
+    requested += [("compliance", i, compliance_names[i], "pdf") for i in compliance_template_ids]
+    for work_id, end_date, legal_name in works:
+        folder = f"{_safe_name(legal_name)}_FY{end_date.year}_{work_id}"
+        seen = set()
+        for kind, template_id, name, ext in requested:
+            if (kind, template_id) in seen:
+                notes.append({"work_id": work_id, "kind": kind, "template_id": template_id, "error": "Listed more than once; included once"})
+                continue
+            seen.add((kind, template_id))
+            arcname = _unique_arcname(f"{folder}/{_safe_name(name)}", ext, used_names)
+            if arcname != f"{folder}/{_safe_name(name)}.{ext}":
+                notes.append({"work_id": work_id, "kind": kind, "template_id": template_id, "error": f"Name already used; saved as {arcname}"})
+            tasks.append((work_id, kind, template_id, arcname))
+
+    job = BatchJob([w.id for w in works], tasks, format, list(signatory_ids))
+    job.errors.extend(notes)
+    _jobs[job.id] = job
+    runner = asyncio.create_task(_run_job(job))
+    _running.add(runner)
+    runner.add_done_callback(_running.discard)
+    return job
+
+async def _render_task(session: AsyncSession, job: BatchJob, work_id: int, kind: str, template_id: int, path: str):
+    """Writes one artifact to `path`, served from the artifact cache when possible."""
+    if kind == "statement":
+        key = await report_cache_key(session, work_id, template_id, job.format)
+        ext = job.format
+        render = lambda tmp_path: write_report(session, work_id, template_id, job.format, tmp_path)
+    else:
+        key = await compliance_cache_key(session, work_id, template_id, job.signatory_ids)
+        ext = "pdf"
+        async def render(tmp_path):
+            html = await generate_compliance_doc(session, work_id, template_id, job.signatory_ids)
+            await session.commit() # Release the connection before the (slow) PDF render
+            await write_compliance_pdf(html, tmp_path)
+
+    with await artifact_cache.open_or_render(key, ext, render) as src, open(path, "wb") as dest:
+        shutil.copyfileobj(src, dest, CHUNK_SIZE)
+
+async def _run_job(job: BatchJob):
+    job.status = "RUNNING"
+    queue: asyncio.Queue = asyncio.Queue()
+    for task in job.tasks:
+        queue.put_nowait(task)
+
+    async def worker():
+        # One session per worker: an AsyncSession must not be shared between tasks
+        async with AsyncSessionLocal() as session:
+            while True:
+                try:
+                    work_id, kind, template_id, arcname = queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    return
+                path = os.path.join(job.directory, f"{uuid.uuid4().hex}_{os.path.basename(arcname)}")
+                try:
+                    await _render_task(session, job, work_id, kind, template_id, path)
+                    job.files.append((arcname, path))
+                    job.completed += 1
+                except Exception as e:
+                    await session.rollback()
+                    job.failed += 1
+                    detail = e.detail if isinstance(e, HTTPException) else str(e)
+                    job.errors.append({"work_id": work_id, "kind": kind, "template_id": template_id, "error": detail})
+                await job._notify()
+
+    try:
+        await asyncio.gather(*(worker() for _ in range(max(1, settings.BATCH_REPORT_CONCURRENCY))))
+        job.status = "DONE"
+    except Exception as e:
+        job.status = "FAILED"
+        job.errors.append({"error": str(e)})
+    finally:
+        job.finished_at = time.time()
+        await job._notify()
+
+class _ZipSink:
+    """Write-only, unseekable file object collecting what zipfile writes, for streaming."""
+    def __init__(self):
+        self._chunks: List[bytes] = []
+        self._offset = 0
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        self._offset += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._offset
+
+    def flush(self):
+        pass
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+async def stream_job_zip(job: BatchJob) -> AsyncIterator[bytes]:
+    """
+    Yields the ZIP as it is written, one chunk at a time. Files are added as
+    they finish, so a download started while the job runs streams along with it.
+    Memory per download stays at about one chunk.
+    """
+    sink = _ZipSink()
+    # STORED: PDFs and XLSX are already compressed
+    with zipfile.ZipFile(sink, mode="w", compression=zipfile.ZIP_STORED) as archive:
+        sent = 0
+        while True:
+            if sent < len(job.files):
+                arcname, path = job.files[sent]
+                sent += 1
+                with open(path, "rb") as src, archive.open(arcname, mode="w", force_zip64=True) as dest:
+                    while chunk := src.read(CHUNK_SIZE):
+                        dest.write(chunk)
+                        yield sink.drain()
+                if data := sink.drain():
+                    yield data
+            elif job.done:
+                break
+            else:
+                await job.wait_for_change()
+
+        if job.errors:
+            lines = [f"{e.get('work_id', '')}\t{e.get('kind', '')}\t{e.get('template_id', '')}\t{e['error']}" for e in job.errors]
+            archive.writestr("errors.txt", "\n".join(lines))
+    yield sink.drain()
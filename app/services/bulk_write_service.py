@@ -0,0 +1,129 @@
+# app/services/bulk_write_service.py
+import csv
+import io
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Union
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import Table, insert
+from sqlalchemy.dialects import postgresql, sqlite
+from app.models.domain import Base, TrialBalanceEntry, MappedLedgerEntry
+
+Row = Union[Dict[str, Any], Sequence[Any]]
+
+async def bulk_insert(
+    session: AsyncSession,
+    target: Union[type, Table],
+    rows: Iterable[Row],
+    columns: Optional[Sequence[str]] = None
+) -> int:
+    """
+    Inserts plain rows with one executemany-style Core INSERT.
+    Skips the ORM unit of work and identity map entirely, so nothing is
+    tracked by the session afterwards. Rows are dicts, or tuples in the
+    order given by `columns`. Runs inside the caller's transaction.
+    """
+    table = target.__table__ if isinstance(target, type) and issubclass(target, Base) else target
+    
+    if columns is not None:
+        params: List[Dict[str, Any]] = [dict(zip(columns, row)) for row in rows]
+    else:
+        params = rows if isinstance(rows, list) else list(rows)
+    
+    if not params:
+        return 0
+    
+    await session.execute(insert(table), params)
+    return len(params)
+
+_TB_COLUMNS = ("work_unit_id", "version_number", "account_name", "debit", "credit", "closing_balance")
+
+async def insert_trial_balance_entries(
+    session: AsyncSession,
+    unit_id: int,
+    version_number: int,
+    records: Iterable[Dict[str, Any]]
+) -> int:
+    """
+    Writes parsed TB records (see `csv_parser.trial_balance_records`) as one version of a unit.
+    COPY on PostgreSQL, one executemany INSERT elsewhere (SQLite).
+    """
+    rows = (
+        (unit_id, version_number, r['account_name'], r['debit'], r['credit'], r['closing_balance'])
+        for r in records
+    )
+    if session.get_bind().dialect.name == "postgresql":
+        return await copy_rows(session, TrialBalanceEntry.__table__, rows, _TB_COLUMNS)
+    return await bulk_insert(session, TrialBalanceEntry, rows, columns=_TB_COLUMNS)
+
+async def copy_rows(
+    session: AsyncSession,
+    table: Table,
+    rows: Iterable[Sequence[Any]],
+    columns: Sequence[str]
+) -> int:
+    """
+    PostgreSQL only: streams rows into `table` with COPY ... FROM STDIN (CSV)
+    over the session's asyncpg connection, inside the caller's transaction,
+    which must already have run a statement (uploads have, see
+    `process_trial_balance_upload`).
+    Much faster than INSERT for large batches: no per-row statement or bind
+    round trips, and the server parses the values itself.
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator="\n")
+    count = 0
+    for row in rows:
+        writer.writerow(row)
+        count += 1
+    if not count:
+        return 0
+
+    connection = await session.connection()
+    driver = (await connection.get_raw_connection()).driver_connection
+    # The driver opens the transaction with the first statement; a COPY before that
+    # would commit on its own and survive the caller's rollback
+    if not driver.is_in_transaction():
+        raise RuntimeError("copy_rows needs a transaction that has already run a statement")
+    await driver.copy_to_table(
+        table.name,
+        source=io.BytesIO(buffer.getvalue().encode()),
+        columns=list(columns),
+        format="csv"
+    )
+    return count
+
+async def insert_mapped_entries(
+    session: AsyncSession,
+    mappings: Iterable[Sequence[int]]
+) -> int:
+    """Writes (trial_balance_entry_id, account_sub_head_id) pairs as new mappings."""
+    return await bulk_insert(
+        session,
+        MappedLedgerEntry,
+        mappings,
+        columns=("trial_balance_entry_id", "account_sub_head_id")
+    )
+
+async def upsert_mapped_entries(
+    session: AsyncSession,
+    mappings: Iterable[Sequence[int]]
+) -> int:
+    """
+    Creates or re-points mappings for (trial_balance_entry_id, account_sub_head_id)
+    pairs in a single INSERT .. ON CONFLICT statement on SQLite and PostgreSQL.
+    """
+    params = [
+        {"trial_balance_entry_id": entry_id, "account_sub_head_id": sub_head_id}
+        for entry_id, sub_head_id in mappings
+    ]
+    if not params:
+        return 0
+
+    # Both supported backends speak INSERT .. ON CONFLICT DO UPDATE
+    dialect = postgresql if session.get_bind().dialect.name == "postgresql" else sqlite
+    stmt = dialect.insert(MappedLedgerEntry.__table__)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["trial_balance_entry_id"],
+        set_={"account_sub_head_id": stmt.excluded.account_sub_head_id}
+    )
+    await session.execute(stmt, params)
+    return len(params)
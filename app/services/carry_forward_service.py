@@ -0,0 +1,101 @@
+# app/services/carry_forward_service.py
+from typing import Dict, Optional
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select
+from app.models.domain import FinancialWork, MappedLedgerEntry, TrialBalanceEntry, WorkUnit
+from app.services.bulk_write_service import insert_mapped_entries
+from app.utils.csv_parser import normalize_account_name
+
+# Rows fetched per round trip while matching the new version
+_FETCH_BATCH = 5000
+
+def _build_index(rows) -> Dict[str, int]:
+    """
+    Hash index: normalized account_name -> account_sub_head_id.
+    Names that were mapped to different sub-heads are ambiguous and dropped.
+    """
+    index: Dict[str, Optional[int]] = {}
+    for account_name, sub_head_id in rows:
+        key = normalize_account_name(account_name)
+        if index.setdefault(key, sub_head_id) != sub_head_id:
+            index[key] = None
+    return {key: sub_head_id for key, sub_head_id in index.items() if sub_head_id is not None}
+
+async def _previous_version_index(session: AsyncSession, unit_id: int, version_number: int) -> Dict[str, int]:
+    result = await session.execute(
+        select(TrialBalanceEntry.account_name, MappedLedgerEntry.account_sub_head_id)
+        .join(MappedLedgerEntry, MappedLedgerEntry.trial_balance_entry_id == TrialBalanceEntry.id)
+        .where(
+            TrialBalanceEntry.work_unit_id == unit_id,
+            TrialBalanceEntry.version_number == version_number
+        )
+    )
+    return _build_index(result.all())
+
+async def _prior_year_index(session: AsyncSession, work_id: int) -> Dict[str, int]:
+    """Mappings from the current TB of every unit of the company's previous work."""
+    work = await session.get(FinancialWork, work_id)
+    prior_res = await session.execute(
+        select(FinancialWork.id)
+        .where(
+            FinancialWork.company_id == work.company_id,
+            FinancialWork.end_date < work.start_date
+        )
+        .order_by(FinancialWork.end_date.desc())
+        .limit(1)
+    )
+    prior_work_id = prior_res.scalar()
+    if prior_work_id is None:
+        return {}
+
+    result = await session.execute(
+        select(TrialBalanceEntry.account_name, MappedLedgerEntry.account_sub_head_id)
+        .join(MappedLedgerEntry, MappedLedgerEntry.trial_balance_entry_id == TrialBalanceEntry.id)
+        .join(
+            WorkUnit,
+            (TrialBalanceEntry.work_unit_id == WorkUnit.id) &
+            (TrialBalanceEntry.version_number == WorkUnit.current_version)
+        )
+        .where(WorkUnit.financial_work_id == prior_work_id)
+    )
+    return _build_index(result.all())
+
+async def carry_forward_mappings(
+    session: AsyncSession,
+    unit: WorkUnit,
+    new_version: int
+) -> int:
+    """
+    Re-applies existing mappings to the freshly inserted `new_version` rows of `unit`.
+    Source: the unit's previous version, or if this is its first upload,
+    the prior year's work of the same company. Matching is by normalized
+    account name; all matches are inserted in one bulk statement.
+    Must run before `unit.current_version` is moved to `new_version`.
+    Returns the number of entries that were mapped and the (ledger name,
+    sub-head) pairs used; pass those to `record_mappings` once committed.
+    """
+    if unit.current_version:
+        index = await _previous_version_index(session, unit.id, unit.current_version)
+    else:
+        index = await _prior_year_index(session, unit.financial_work_id)
+    if not index:
+        return 0, set()
+
+    matches = []
+    learned = set()
+    result = await session.stream(
+        select(TrialBalanceEntry.id, TrialBalanceEntry.account_name)
+        .where(
+            TrialBalanceEntry.work_unit_id == unit.id,
+            TrialBalanceEntry.version_number == new_version
+        )
+        .execution_options(yield_per=_FETCH_BATCH)
+    )
+    async for partition in result.partitions():
+        for entry_id, account_name in partition:
+            sub_head_id = index.get(normalize_account_name(account_name))
+            if sub_head_id is not None:
+                matches.append((entry_id, sub_head_id))
+                learned.add((account_name, sub_head_id))
+
+    return await insert_mapped_entries(session, matches), learned
@@ -0,0 +1,68 @@
+# app/services/coa_cache.py
+import asyncio
+from typing import Dict, List, Optional, Tuple
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select
+from app.models.domain import Account
+from app.services.rollup_engine import RollupTree
+
+class AccountRecord:
+    """Read-only, compact copy of an Account row (no ORM state attached)."""
+    __slots__ = ("id", "name", "type", "category_type", "parent_id")
+
+    def __init__(self, id: int, name: str, type: str, category_type: str, parent_id: Optional[int]):
+        self.id = id
+        self.name = name
+        self.type = type
+        self.category_type = category_type
+        self.parent_id = parent_id
+
+class CoASnapshot:
+    """
+    Immutable view of the whole Chart of Accounts, shared across requests.
+    Consumers must treat the maps as read-only.
+    """
+    __slots__ = ("version", "account_map", "children_map", "root_ids", "rollup_tree")
+
+    def __init__(self, version: int, records: List[AccountRecord]):
+        self.version = version
+        self.account_map: Dict[int, AccountRecord] = {rec.id: rec for rec in records}
+        self.children_map: Dict[int, List[int]] = {}
+        self.root_ids: Tuple[int, ...] = tuple(rec.id for rec in records if rec.parent_id is None)
+        for rec in records:
+            if rec.parent_id:
+                self.children_map.setdefault(rec.parent_id, []).append(rec.id)
+        self.rollup_tree = RollupTree(self.root_ids, self.children_map)
+
+# Process-wide state. Every write to `accounts` must call bump_coa_version()
+# after its commit; the next reader then rebuilds the snapshot.
+_coa_version = 0
+_snapshot: Optional[CoASnapshot] = None
+_rebuild_lock = asyncio.Lock()
+
+def bump_coa_version():
+    """Invalidates the cached snapshot. Call after committing any Account change."""
+    global _coa_version
+    _coa_version += 1
+
+async def get_coa_snapshot(session: AsyncSession) -> CoASnapshot:
+    """Returns the current snapshot, reloading the accounts table only after a bump."""
+    global _snapshot
+    snapshot = _snapshot
+    if snapshot is not None and snapshot.version == _coa_version:
+        return snapshot
+
+    async with _rebuild_lock:
+        # Another request may have rebuilt it while we waited
+        if _snapshot is not None and _snapshot.version == _coa_version:
+            return _snapshot
+
+        # Tag with the version seen *before* loading: a bump during the load
+        # leaves the snapshot stale and the next call rebuilds it again.
+        version = _coa_version
+        result = await session.execute(
+            select(Account.id, Account.name, Account.type, Account.category_type, Account.parent_id)
+            .order_by(Account.id)
+        )
+        _snapshot = CoASnapshot(version, [AccountRecord(*row) for row in result.all()])
+        return _snapshot
@@ -4,10 +4,100 @@ from datetime import date
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
 from sqlalchemy.orm import joinedload
-from jinja2 import Template
-from weasyprint import HTML
+from typing import Any, Dict, List, Optional, Tuple
+from jinja2 import Template, TemplateSyntaxError
 
 from app.models.domain import FinancialWork, OrganizationSettings, ComplianceTemplate, Signatory
+from app.services.artifact_cache import make_key
+from app.services.pdf_renderer import render_pdf, render_pdf_to_file
+from app.services.template_engine import environment, get_template
+
+class ComplianceTemplateError(ValueError):
+    pass
+
+# Prepended to every compliance template. Defines macros only, so it renders to nothing.
+SIGNATORY_MACROS = """{%- macro signatory_block(signatories, title=None) -%}
+<div style="margin-top: 30px;">
+{%- if title %}<p><strong>{{ title }}</strong></p>{% endif %}
+{%- for sig in signatories %}
+    <div style="margin-bottom: 20px; page-break-inside: avoid;">
+        <p>__________________________</p>
+        <p><strong>{{ sig.name }}</strong></p>
+        <p>{{ sig.designation }}</p>
+        <p>DIN/PAN: {{ sig.din_number or sig.pan_number }}</p>
+    </div>
+{%- endfor %}
+</div>
+{%- endmacro %}"""
+
+def build_template_source(content_html: Optional[str], blocks: Optional[List[Dict[str, Any]]]) -> str:
+    """
+    Assembles one Jinja source for a compliance template: text blocks verbatim,
+    signatory blocks as macro calls. Legacy templates use `content_html` as is.
+    Raises ComplianceTemplateError (naming the block) if any part does not compile.
+    """
+    if blocks is None:
+        parts = [content_html or ""]
+        _check_syntax(parts[0], "Template")
+    else:
+        parts = []
+        for pos, block in enumerate(blocks, start=1):
+            if block.get('type') == 'text':
+                content = block.get('content') or ""
+                _check_syntax(content, f"Block {pos}")
+                parts.append(content)
+            elif block.get('type') == 'signatories':
+                # JSON string literals are valid Jinja string literals
+                title = json.dumps(block['title']) if block.get('title') else "None"
+                parts.append(f"{{{{ signatory_block(signatories, {title}) }}}}")
+
+    return SIGNATORY_MACROS + "".join(parts)
+
+def _check_syntax(source: str, where: str):
+    try:
+        environment.parse(source)
+    except TemplateSyntaxError as e:
+        raise ComplianceTemplateError(f"{where}, line {e.lineno}: {e.message}")
+
+# (template id, revision) -> compiled template
+_compiled: Dict[Tuple[int, int], Template] = {}
+
+def compile_compliance_template(template: ComplianceTemplate) -> Template:
+    """Compiled template for this revision; compiles (and caches) on first use."""
+    key = (template.id, template.revision)
+    compiled = _compiled.get(key)
+    if compiled is None:
+        blocks = json.loads(template.template_definition) if template.template_definition else None
+        compiled = get_template(build_template_source(template.content_html, blocks))
+        # Older revisions of this template will never be asked for again
+        for stale in [k for k in _compiled if k[0] == template.id]:
+            del _compiled[stale]
+        _compiled[key] = compiled
+    return compiled
+
+async def compliance_cache_key(
+    session: AsyncSession,
+    work_id: int,
+    template_id: int,
+    signatory_ids: list[int] = None
+) -> str:
+    """Artifact key (and ETag) of a compliance PDF, without rendering it."""
+    result = await session.execute(select(
+        select(FinancialWork.data_revision).where(FinancialWork.id == work_id).scalar_subquery(),
+        select(ComplianceTemplate.revision).where(ComplianceTemplate.id == template_id).scalar_subquery(),
+        select(OrganizationSettings.revision).where(OrganizationSettings.id == 1).scalar_subquery()
+    ))
+    work_revision, template_revision, settings_revision = result.one()
+    if work_revision is None: raise ValueError("Work not found")
+    if template_revision is None: raise ValueError("Template not found")
+    return make_key(
+        kind="compliance", work_id=work_id, work_revision=work_revision,
+        template_id=template_id, template_revision=template_revision,
+        settings_revision=settings_revision or 0,
+        signatory_ids=sorted(set(signatory_ids or [])),
+        # Documents carry today's date
+        date=date.today().isoformat(), format="pdf"
+    )
 
 async def generate_compliance_doc(
     session: AsyncSession, 
@@ -63,47 +153,19 @@ async def generate_compliance_doc(
         "signatories": selected_signatories
     }
 
-    # 6. Assemble Blocks
-    final_html = ""
-    
-    # If using new Block system
-    if template.template_definition:
-        blocks = json.loads(template.template_definition)
-        for block in blocks:
-            if block['type'] == 'text':
-                # Render text block with Jinja variables
-                t = Template(block['content'])
-                final_html += t.render(**context)
-            
-            elif block['type'] == 'signatories':
-                # Render Dynamic Signatory Section
-                sig_html = '<div style="margin-top: 30px;">'
-                if block.get('title'):
-                    sig_html += f"<p><strong>{block['title']}</strong></p>"
-                
-                # Loop through selected signatories
-                for sig in selected_signatories:
-                    sig_html += f"""
-                    <div style="margin-bottom: 20px; page-break-inside: avoid;">
-                        <p>__________________________</p>
-                        <p><strong>{sig.name}</strong></p>
-                        <p>{sig.designation}</p>
-                        <p>DIN/PAN: {sig.din_number or sig.pan_number}</p>
-                    </div>
-                    """
-                sig_html += "</div>"
-                final_html += sig_html
+    # 6. Render (compiled once per template revision)
+    return compile_compliance_template(template).render(**context)
 
-    else:
-        # Fallback for legacy templates (pure HTML)
-        jinja_template = Template(template.content_html)
-        final_html = jinja_template.render(**context)
-    
-    return final_html
+async def html_to_pdf(html_content: str):
+    return await render_pdf(_styled_document(html_content))
 
-def html_to_pdf(html_content: str):
+async def write_compliance_pdf(html_content: str, path: str):
+    """Same as html_to_pdf, written straight to the file at `path`."""
+    await render_pdf_to_file(_styled_document(html_content), path)
+
+def _styled_document(html_content: str) -> str:
     # Add basic styling for the document
-    styled_html = f"""
+    return f"""
     <html>
     <head>
         <style>
@@ -119,5 +181,4 @@ def html_to_pdf(html_content: str):
         {html_content}
     </body>
     </html>
-    """
-    return HTML(string=styled_html).write_pdf()
\ No newline at end of file
+    """
\ No newline at end of file
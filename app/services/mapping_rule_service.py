@@ -0,0 +1,263 @@
+# app/services/mapping_rule_service.py
+import re
+from collections import Counter
+from typing import Dict, List, Optional, Sequence, Tuple
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, or_
+from app.models.domain import (
+    FinancialWork, MappedLedgerEntry, MappingRule, MappingRuleType, TrialBalanceEntry, WorkUnit
+)
+from app.services.bulk_write_service import insert_mapped_entries
+from app.utils.csv_parser import normalize_account_name
+
+# Rows fetched per round trip while matching a new TB version
+_FETCH_BATCH = 5000
+
+class RuleCompileError(ValueError):
+    pass
+
+class RuleMatcher:
+    """
+    All rules of one company (plus firm-wide rules) compiled into one matcher.
+    Every rule gets a rank (company before firm-wide, then priority, then id);
+    each rule kind is compiled into a structure that finds its best-ranked
+    hit without looping over rules:
+      - EXACT:   hash of normalized names
+      - PREFIX:  hash of prefixes, probed once per distinct prefix length
+      - KEYWORD: hash of word phrases, probed per phrase in the name
+      - REGEX:   indexed by a literal every match must contain; only regexes
+                 whose literal occurs in the name are run, in rank order
+    The lowest rank over the four kinds wins. Names are matched normalized
+    (see `normalize_account_name`), so regexes see lowercase, single-spaced text.
+    """
+    def __init__(self, rules: Sequence[MappingRule]):
+        ordered = sorted(rules, key=lambda r: (r.company_id is None, r.priority, r.id))
+        self.rule_count = len(ordered)
+        self._sub_heads: List[int] = []
+        self._exact: Dict[str, int] = {}
+        self._prefix: Dict[str, int] = {}
+        self._prefix_lengths: Tuple[int, ...] = ()
+        self._keyword: Dict[str, int] = {}
+        self._keyword_sizes: Tuple[int, ...] = ()
+        self._regex: Dict[int, re.Pattern] = {}
+        self._regex_anchors: Dict[str, List[Tuple[str, Tuple[str, ...], int]]] = {} # n-gram -> [(anchor, other literals, rank)]
+        self._regex_unanchored: List[int] = []
+
+        regex_literals: List[Tuple[int, List[str]]] = []
+        for rank, rule in enumerate(ordered):
+            self._sub_heads.append(rule.account_sub_head_id)
+            pattern = normalize_account_name(rule.pattern) if rule.match_type != MappingRuleType.REGEX else rule.pattern
+            if not pattern:
+                continue
+            if rule.match_type == MappingRuleType.EXACT:
+                self._exact.setdefault(pattern, rank)
+            elif rule.match_type == MappingRuleType.PREFIX:
+                self._prefix.setdefault(pattern, rank)
+            elif rule.match_type == MappingRuleType.KEYWORD:
+                self._keyword.setdefault(pattern, rank)
+            elif rule.match_type == MappingRuleType.REGEX:
+                self._regex[rank] = re.compile(pattern, re.IGNORECASE)
+                regex_literals.append((rank, _required_literals(pattern)))
+            else:
+                raise RuleCompileError(f"Unknown rule type: {rule.match_type}")
+
+        # Anchor each regex on the literal fewest other regexes share, so buckets stay small
+        shared = Counter(lit for _, literals in regex_literals for lit in set(literals))
+        for rank, literals in regex_literals:
+            if not literals:
+                self._regex_unanchored.append(rank)
+                continue
+            anchor = min(literals, key=lambda lit: (shared[lit], -len(lit)))
+            others = tuple(lit for lit in literals if lit != anchor)
+            self._regex_anchors.setdefault(anchor[:_ANCHOR_SIZE], []).append((anchor, others, rank))
+
+        self._prefix_lengths = tuple(sorted({len(p) for p in self._prefix}))
+        self._keyword_sizes = tuple(sorted({len(k.split()) for k in self._keyword}))
+
+    def match(self, account_name: str) -> Optional[int]:
+        """Sub-head of the best-ranked matching rule, or None."""
+        name = normalize_account_name(account_name)
+        best = self._exact.get(name)
+
+        for length in self._prefix_lengths:
+            if length > len(name):
+                break
+            rank = self._prefix.get(name[:length])
+            if rank is not None and (best is None or rank < best):
+                best = rank
+
+        if self._keyword_sizes:
+            words = name.split()
+            for size in self._keyword_sizes:
+                for start in range(len(words) - size + 1):
+                    rank = self._keyword.get(" ".join(words[start:start + size]))
+                    if rank is not None and (best is None or rank < best):
+                        best = rank
+
+        if self._regex:
+            candidates = set(self._regex_unanchored)
+            if self._regex_anchors:
+                for start in range(len(name) - _ANCHOR_SIZE + 1):
+                    for anchor, others, rank in self._regex_anchors.get(name[start:start + _ANCHOR_SIZE], ()):
+                        if name.startswith(anchor, start) and all(lit in name for lit in others):
+                            candidates.add(rank)
+            for rank in sorted(candidates):
+                if best is not None and rank >= best:
+                    break
+                if self._regex[rank].search(name):
+                    best = rank
+                    break
+
+        return self._sub_heads[best] if best is not None else None
+
+# Regex literals shorter than this are too common to narrow anything down
+_ANCHOR_SIZE = 3
+
+def _required_literals(pattern: str) -> List[str]:
+    """
+    Runs of plain characters at the top level of `pattern`; every match must
+    contain all of them. Read from the pattern text with a deliberately
+    conservative scan: groups, classes and escapes like \\s end a run, and a
+    quantifier also drops the character it repeats. Anything the scan does not
+    follow (top-level alternation, inline flags, numeric or named escapes)
+    yields no literals, so that regex is simply tried on every name.
+    """
+    runs, current = [], []
+    i, n = 0, len(pattern)
+    while i < n:
+        ch = pattern[i]
+        if ch == "\\":
+            if i + 1 == n or pattern[i + 1] in "xuUN0123456789":
+                return []
+            if pattern[i + 1].isalnum(): # \d, \s, \b, \w, \A, ...
+                runs.append("".join(current))
+                current = []
+            else:
+                current.append(pattern[i + 1])
+            i += 2
+            continue
+        if ch == "|" or pattern.startswith("(?", i) and pattern[i + 2:i + 3] not in (":", "=", "!", "<", "P"):
+            return []
+        if ch in "*+?{":
+            if current:
+                current.pop()
+            if ch == "{":
+                i = pattern.find("}", i)
+                if i < 0:
+                    return []
+            i += 1
+        elif ch == "(":
+            i = _skip_group(pattern, i)
+        elif ch == "[":
+            i = _skip_class(pattern, i)
+        elif ch in ".^$)]":
+            i += 1
+        else:
+            current.append(ch)
+            i += 1
+            continue
+        if i is None:
+            return []
+        runs.append("".join(current))
+        current = []
+    runs.append("".join(current))
+    return [run.lower() for run in runs if len(run) >= _ANCHOR_SIZE]
+
+def _skip_class(pattern: str, i: int) -> Optional[int]:
+    """Index just past the [...] set starting at `i`, or None if it never closes."""
+    i += 1
+    if pattern.startswith("^", i):
+        i += 1
+    if pattern.startswith("]", i): # A leading ] is a member, not the end
+        i += 1
+    while i < len(pattern):
+        if pattern[i] == "\\":
+            i += 2
+        elif pattern[i] == "]":
+            return i + 1
+        else:
+            i += 1
+    return None
+
+def _skip_group(pattern: str, i: int) -> Optional[int]:
+    """Index just past the (...) group starting at `i`, nested groups and sets included."""
+    depth = 0
+    while i is not None and i < len(pattern):
+        ch = pattern[i]
+        if ch == "\\":
+            i += 2
+        elif ch == "[":
+            i = _skip_class(pattern, i)
+        else:
+            if ch == "(":
+                depth += 1
+            elif ch == ")":
+                depth -= 1
+                if depth == 0:
+                    return i + 1
+            i += 1
+    return None
+
+def validate_rule(match_type: str, pattern: str):
+    """Checks a rule at save time; raises RuleCompileError when it cannot be compiled."""
+    if match_type not in MappingRuleType.__members__:
+        raise RuleCompileError(f"match_type must be one of {list(MappingRuleType.__members__)}")
+    if not normalize_account_name(pattern):
+        raise RuleCompileError("pattern must not be empty")
+    if match_type == MappingRuleType.REGEX:
+        try:
+            re.compile(pattern, re.IGNORECASE)
+        except re.error as e:
+            raise RuleCompileError(f"Invalid regex: {e.msg}")
+
+# Process-wide compiled matchers per company, dropped whenever a rule changes
+_matchers: Dict[int, RuleMatcher] = {}
+
+def invalidate_rule_matchers():
+    """Call after committing any MappingRule change."""
+    _matchers.clear()
+
+async def get_rule_matcher(session: AsyncSession, company_id: int) -> RuleMatcher:
+    matcher = _matchers.get(company_id)
+    if matcher is None:
+        result = await session.execute(
+            select(MappingRule).where(or_(MappingRule.company_id == company_id, MappingRule.company_id.is_(None)))
+        )
+        matcher = _matchers[company_id] = RuleMatcher(result.scalars().all())
+    return matcher
+
+async def apply_mapping_rules(session: AsyncSession, unit: WorkUnit, version_number: int) -> int:
+    """
+    Maps every still-unmapped entry of `version_number` that a rule matches.
+    Distinct names are matched once; all hits are inserted in one bulk statement.
+    Returns the number of entries that were mapped and the (ledger name,
+    sub-head) pairs used; pass those to `record_mappings` once committed.
+    """
+    work = await session.get(FinancialWork, unit.financial_work_id)
+    matcher = await get_rule_matcher(session, work.company_id)
+    if not matcher.rule_count:
+        return 0, set()
+
+    matches = []
+    learned = set()
+    seen: Dict[str, Optional[int]] = {}
+    result = await session.stream(
+        select(TrialBalanceEntry.id, TrialBalanceEntry.account_name)
+        .outerjoin(MappedLedgerEntry, TrialBalanceEntry.id == MappedLedgerEntry.trial_balance_entry_id)
+        .where(
+            TrialBalanceEntry.work_unit_id == unit.id,
+            TrialBalanceEntry.version_number == version_number,
+            MappedLedgerEntry.id.is_(None)
+        )
+        .execution_options(yield_per=_FETCH_BATCH)
+    )
+    async for partition in result.partitions():
+        for entry_id, account_name in partition:
+            if account_name not in seen:
+                seen[account_name] = matcher.match(account_name)
+            sub_head_id = seen[account_name]
+            if sub_head_id is not None:
+                matches.append((entry_id, sub_head_id))
+                learned.add((account_name, sub_head_id))
+
+    return await insert_mapped_entries(session, matches), learned
@@ -1,39 +1,32 @@
 # app/services/mapping_service.py
+from typing import Any, Dict, List, Tuple
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, and_, func
+from sqlalchemy import select, and_
 from fastapi import HTTPException
-from app.models.domain import TrialBalanceEntry, MappedLedgerEntry, Account, AccountType, WorkUnit
+from app.models.domain import TrialBalanceEntry, MappedLedgerEntry, AccountType, WorkUnit
+from app.services.artifact_cache import bump_work_revision
+from app.services.balance_snapshot_service import add_mapping_delta, apply_balance_deltas, lock_units
+from app.services.bulk_write_service import upsert_mapped_entries
+from app.services.coa_cache import get_coa_snapshot
+from app.services.suggestion_service import record_mappings
 
 async def get_unmapped_entries(session: AsyncSession, work_id: int):
     """
     Fetch unmapped entries for the LATEST version of ALL units in a work.
     """
     
-    # 1. Subquery to find max version per unit
-    # SELECT work_unit_id, MAX(version_number) FROM entries JOIN units WHERE work_id = X GROUP BY unit_id
-    subq = (
-        select(
-            TrialBalanceEntry.work_unit_id,
-            func.max(TrialBalanceEntry.version_number).label("max_ver")
-        )
-        .join(WorkUnit, TrialBalanceEntry.work_unit_id == WorkUnit.id)
-        .where(WorkUnit.financial_work_id == work_id)
-        .group_by(TrialBalanceEntry.work_unit_id)
-        .subquery()
-    )
-
-    # 2. Main Query: Entries matching that Unit+Version, AND unmapped
+    # Entries of each unit's current version, AND unmapped
     query = (
         select(TrialBalanceEntry)
         .join(
-            subq, 
+            WorkUnit, 
             and_(
-                TrialBalanceEntry.work_unit_id == subq.c.work_unit_id,
-                TrialBalanceEntry.version_number == subq.c.max_ver
+                TrialBalanceEntry.work_unit_id == WorkUnit.id,
+                TrialBalanceEntry.version_number == WorkUnit.current_version
             )
         )
         .outerjoin(MappedLedgerEntry, TrialBalanceEntry.id == MappedLedgerEntry.trial_balance_entry_id)
-        .where(MappedLedgerEntry.id.is_(None))
+        .where(WorkUnit.financial_work_id == work_id, MappedLedgerEntry.id.is_(None))
     )
     
     result = await session.execute(query)
@@ -45,9 +38,7 @@ async def map_entry_to_account(
     account_sub_head_id: int
 ):
     # Validate Accounts...
-    account_query = select(Account).where(Account.id == account_sub_head_id)
-    result = await session.execute(account_query)
-    account = result.scalars().first()
+    account = (await get_coa_snapshot(session)).account_map.get(account_sub_head_id)
     
     if not account or account.type != AccountType.SUB_HEAD:
         raise HTTPException(status_code=400, detail="Invalid Account")
@@ -57,12 +48,31 @@ async def map_entry_to_account(
     if not entry:
         raise HTTPException(status_code=404, detail="Entry not found")
 
+    # Lock the unit first: the version and the existing mapping read below stay valid until commit
+    current_versions = await lock_units(session, WorkUnit.id == entry.work_unit_id)
+
     # Check existing
-    existing = await session.execute(select(MappedLedgerEntry).where(MappedLedgerEntry.trial_balance_entry_id == trial_balance_entry_id))
+    existing = await session.execute(
+        select(MappedLedgerEntry)
+        .where(MappedLedgerEntry.trial_balance_entry_id == trial_balance_entry_id)
+        .execution_options(populate_existing=True)
+    )
     mapping = existing.scalars().first()
 
+    # Move the entry's amount between sub-heads in the balance snapshot
+    unit = await session.get(WorkUnit, entry.work_unit_id)
+    deltas = {}
+    add_mapping_delta(
+        deltas, entry, current_versions.get(entry.work_unit_id),
+        mapping.account_sub_head_id if mapping else None, account_sub_head_id
+    )
+    await apply_balance_deltas(session, deltas)
+    await bump_work_revision(session, unit.financial_work_id)
+
     if mapping:
         mapping.account_sub_head_id = account_sub_head_id
+        await session.commit()
+        record_mappings([(entry.account_name, account_sub_head_id)])
         return mapping
     else:
         new_mapping = MappedLedgerEntry(
@@ -71,5 +81,74 @@ async def map_entry_to_account(
         )
         session.add(new_mapping)
         await session.commit()
+        record_mappings([(entry.account_name, account_sub_head_id)])
         await session.refresh(new_mapping)
-        return new_mapping
\ No newline at end of file
+        return new_mapping
+
+# Max ids per IN (...) lookup; keeps well under SQLite's bound-parameter limit
+_ID_CHUNK = 5000
+
+async def map_entries_bulk(
+    session: AsyncSession,
+    work_id: int,
+    mappings: List[Tuple[int, int]]
+) -> List[Dict[str, Any]]:
+    """
+    Maps many (trial_balance_entry_id, account_sub_head_id) pairs in one call.
+    Targets are validated against the CoA snapshot, entries are loaded in a
+    few chunked queries, and all valid mappings are upserted in one statement.
+    Returns one result per requested entry; invalid ones are skipped, not fatal.
+    If an entry is listed twice, the last pair wins.
+    """
+    requested = dict(mappings)
+    coa = await get_coa_snapshot(session)
+
+    # 1. Load the entries (with unit version & current mapping) belonging to this work,
+    #    under the units' locks so neither changes before the deltas are applied
+    await lock_units(session, WorkUnit.financial_work_id == work_id)
+    entries = {}
+    entry_ids = list(requested)
+    for start in range(0, len(entry_ids), _ID_CHUNK):
+        result = await session.execute(
+            select(
+                TrialBalanceEntry.id,
+                TrialBalanceEntry.account_name,
+                TrialBalanceEntry.work_unit_id,
+                TrialBalanceEntry.version_number,
+                TrialBalanceEntry.closing_balance,
+                WorkUnit.current_version,
+                MappedLedgerEntry.account_sub_head_id
+            )
+            .join(WorkUnit, TrialBalanceEntry.work_unit_id == WorkUnit.id)
+            .outerjoin(MappedLedgerEntry, TrialBalanceEntry.id == MappedLedgerEntry.trial_balance_entry_id)
+            .where(
+                TrialBalanceEntry.id.in_(entry_ids[start:start + _ID_CHUNK]),
+                WorkUnit.financial_work_id == work_id
+            )
+        )
+        entries.update((row.id, row) for row in result.all())
+
+    # 2. Validate and collect balance movements
+    results = []
+    valid = []
+    deltas = {}
+    for entry_id, sub_head_id in requested.items():
+        account = coa.account_map.get(sub_head_id)
+        entry = entries.get(entry_id)
+        if not account or account.type != AccountType.SUB_HEAD:
+            results.append({"trial_balance_entry_id": entry_id, "status": "error", "detail": "Invalid Account"})
+        elif not entry:
+            results.append({"trial_balance_entry_id": entry_id, "status": "error", "detail": "Entry not found"})
+        else:
+            valid.append((entry_id, sub_head_id))
+            add_mapping_delta(deltas, entry, entry.current_version, entry.account_sub_head_id, sub_head_id)
+            results.append({"trial_balance_entry_id": entry_id, "status": "mapped", "account_sub_head_id": sub_head_id})
+
+    # 3. Write everything in one transaction
+    await upsert_mapped_entries(session, valid)
+    await apply_balance_deltas(session, deltas)
+    if valid:
+        await bump_work_revision(session, work_id)
+    await session.commit()
+    record_mappings((entries[entry_id].account_name, sub_head_id) for entry_id, sub_head_id in valid)
+    return results
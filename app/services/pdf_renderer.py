@@ -0,0 +1,140 @@
+# app/services/pdf_renderer.py
+"""
+All HTML -> PDF conversion goes through here.
+WeasyPrint is CPU-bound and holds the GIL for seconds on large documents,
+so it runs in a small pool of worker processes instead of on the event loop.
+Each worker renders one document at a time over its own pipe, so a render
+that times out is stopped by killing just its worker; renders running on
+the other workers carry on, and the pool starts a replacement when needed.
+  - PDF_RENDER_WORKERS:     pool size
+  - PDF_RENDER_CONCURRENCY: renders allowed in flight (extra callers wait)
+  - PDF_RENDER_TIMEOUT:     seconds before a render is killed (504)
+"""
+import asyncio
+import multiprocessing
+from multiprocessing.connection import Connection
+from typing import Optional, Set
+from fastapi import HTTPException
+
+from app.core.config import settings
+
+def _write_pdf(html: str, path: Optional[str] = None) -> Optional[bytes]:
+    # With a path the PDF goes straight to disk and never crosses the process boundary
+    from weasyprint import HTML
+    return HTML(string=html).write_pdf(path)
+
+def _worker_main(conn: Connection):
+    """Worker process loop: (html, path) in, (ok, result or exception) out, None to stop."""
+    # Pay the WeasyPrint import once per worker, not on the first request
+    import weasyprint # noqa: F401
+    while True:
+        task = conn.recv()
+        if task is None:
+            break
+        try:
+            conn.send((True, _write_pdf(*task)))
+        except Exception as e:
+            try:
+                conn.send((False, e))
+            except Exception: # Exception that does not pickle
+                conn.send((False, RuntimeError(repr(e))))
+
+class _Worker:
+    def __init__(self):
+        # spawn: forking a process that runs an event loop and DB threads is unsafe
+        context = multiprocessing.get_context("spawn")
+        self.conn, child_conn = context.Pipe()
+        self.process = context.Process(target=_worker_main, args=(child_conn,), daemon=True)
+        self.process.start()
+        child_conn.close()
+
+    def render(self, html: str, path: Optional[str]):
+        """Blocking round trip; runs in a thread. EOFError once the worker is killed."""
+        self.conn.send((html, path))
+        return self.conn.recv()
+
+    def kill(self):
+        # The thread blocked in render() then gets EOFError; the pipe closes once unreferenced
+        self.process.terminate()
+
+    def stop(self):
+        try:
+            self.conn.send(None)
+        except OSError:
+            pass
+        self.process.join(5)
+        if self.process.is_alive():
+            self.process.terminate()
+        self.conn.close()
+
+class _WorkerPool:
+    """Up to `size` workers, started on demand; a killed worker is replaced straight away."""
+    def __init__(self, size: int):
+        self.size = size
+        self.workers: Set[_Worker] = set()
+        self.idle: asyncio.Queue = asyncio.Queue()
+
+    async def acquire(self) -> _Worker:
+        if self.idle.empty() and len(self.workers) < self.size:
+            worker = _Worker()
+            self.workers.add(worker)
+            return worker
+        return await self.idle.get()
+
+    def release(self, worker: _Worker):
+        self.idle.put_nowait(worker)
+
+    def discard(self, worker: _Worker):
+        self.workers.discard(worker)
+        worker.kill()
+        # Callers may already be waiting for an idle worker
+        replacement = _Worker()
+        self.workers.add(replacement)
+        self.release(replacement)
+
+    def shutdown(self):
+        for worker in self.workers:
+            worker.stop()
+        self.workers.clear()
+        self.idle = asyncio.Queue()
+
+_pool = _WorkerPool(settings.PDF_RENDER_WORKERS)
+_slots = asyncio.Semaphore(settings.PDF_RENDER_CONCURRENCY)
+
+async def render_pdf(html: str) -> bytes:
+    """Renders a full HTML document to PDF bytes off the event loop."""
+    return await _run(html, None)
+
+async def render_pdf_to_file(html: str, path: str):
+    """Renders a full HTML document into the file at `path` (written by the worker)."""
+    await _run(html, path)
+
+async def _run(html: str, path: Optional[str]):
+    async with _slots:
+        worker = await _pool.acquire()
+        loop = asyncio.get_running_loop()
+        try:
+            ok, result = await asyncio.wait_for(
+                loop.run_in_executor(None, worker.render, html, path),
+                timeout=settings.PDF_RENDER_TIMEOUT
+            )
+        except asyncio.TimeoutError:
+            # Only this render's worker goes; the others keep rendering
+            _pool.discard(worker)
+            raise HTTPException(status_code=504, detail="PDF rendering timed out")
+        except (EOFError, OSError):
+            # The worker died under this render (crash, out of memory)
+            _pool.discard(worker)
+            raise HTTPException(status_code=503, detail="PDF renderer unavailable")
+        except BaseException:
+            # Cancelled mid-render: the worker's state is unknown, do not reuse it
+            _pool.discard(worker)
+            raise
+        _pool.release(worker)
+        if not ok:
+            raise result
+        return result
+
+def shutdown_renderer():
+    """Stops the worker processes; called on app shutdown."""
+    _pool.shutdown()
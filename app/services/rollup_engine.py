@@ -0,0 +1,66 @@
+# app/services/rollup_engine.py
+from typing import Dict, Iterable, List, Sequence
+import numpy as np
+
+class RollupTree:
+    """
+    Account hierarchy compiled into flat arrays for balance roll-ups.
+    Nodes are stored in breadth-first (topological) order with a parent
+    index array, and grouped by depth. A roll-up is then one vectorized
+    scatter-add per level, bottom-up, with no recursion, so deep custom
+    hierarchies cannot hit the recursion limit.
+    Only nodes reachable from the roots take part, as before.
+    """
+    __slots__ = ("ids", "index", "parent_idx", "levels")
+
+    def __init__(self, root_ids: Iterable[int], children_map: Dict[int, List[int]]):
+        ids: List[int] = []
+        parents: List[int] = []
+        level_bounds = [0]
+
+        frontier = [(acc_id, -1) for acc_id in root_ids]
+        seen = set()
+        while frontier:
+            next_frontier = []
+            for acc_id, parent_pos in frontier:
+                if acc_id in seen: # Guard against bad data forming a cycle
+                    continue
+                seen.add(acc_id)
+                pos = len(ids)
+                ids.append(acc_id)
+                parents.append(parent_pos)
+                next_frontier.extend((child_id, pos) for child_id in children_map.get(acc_id, ()))
+            level_bounds.append(len(ids))
+            frontier = next_frontier
+
+        self.ids = ids
+        self.index: Dict[int, int] = {acc_id: pos for pos, acc_id in enumerate(ids)}
+        self.parent_idx = np.asarray(parents, dtype=np.intp)
+        # Position ranges per depth, deepest last; roots (depth 0) never push upwards
+        self.levels = [
+            np.arange(start, end, dtype=np.intp)
+            for start, end in zip(level_bounds[1:-1], level_bounds[2:])
+            if end > start
+        ]
+
+    def rollup(self, balances: Dict[int, float]) -> Dict[int, float]:
+        """Rolls one set of own-balances (account_id -> amount) up the tree."""
+        return self.rollup_many([balances])[0]
+
+    def rollup_many(self, balances: Sequence[Dict[int, float]]) -> List[Dict[int, float]]:
+        """
+        Rolls several sets of balances (e.g. one per work) in a single pass.
+        Returns account_id -> total (own + all descendants) for every node.
+        """
+        totals = np.zeros((len(self.ids), len(balances)), dtype=np.float64)
+        index = self.index
+        for col, work_balances in enumerate(balances):
+            for acc_id, amount in work_balances.items():
+                pos = index.get(acc_id)
+                if pos is not None:
+                    totals[pos, col] += amount
+
+        for level in reversed(self.levels):
+            np.add.at(totals, self.parent_idx[level], totals[level])
+
+        return [dict(zip(self.ids, column)) for column in totals.T.tolist()]
@@ -1,72 +1,55 @@
 # app/services/statement_generation_service.py
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, func, and_
-from typing import Dict, List, Tuple
-from app.models.domain import Account, MappedLedgerEntry, TrialBalanceEntry, WorkUnit
+from sqlalchemy import select, func
+from typing import Dict, List, Sequence, Tuple
+from app.models.domain import WorkUnit, WorkUnitBalance
+from app.services.coa_cache import AccountRecord, get_coa_snapshot
 
 async def calculate_statement_data(
     session: AsyncSession, 
     work_id: int
-) -> Tuple[Dict[int, float], Dict[int, Account], Dict[int, List[int]]]:
+) -> Tuple[Dict[int, float], Dict[int, AccountRecord], Dict[int, List[int]]]:
     
     # 1. Fetch Accounts & Hierarchy (Cached)
-    all_accounts = (await session.execute(select(Account))).scalars().all()
-    account_map = {acc.id: acc for acc in all_accounts}
-    children_map: Dict[int, List[int]] = {}
-    for acc in all_accounts:
-        if acc.parent_id:
-            children_map.setdefault(acc.parent_id, []).append(acc.id)
-    
-    balances: Dict[int, float] = {acc.id: 0.0 for acc in all_accounts}
+    coa = await get_coa_snapshot(session)
 
-    # 2. Identify Latest Versions for this Work
-    subq = (
-        select(
-            TrialBalanceEntry.work_unit_id,
-            func.max(TrialBalanceEntry.version_number).label("max_ver")
-        )
-        .join(WorkUnit, TrialBalanceEntry.work_unit_id == WorkUnit.id)
-        .where(WorkUnit.financial_work_id == work_id)
-        .group_by(TrialBalanceEntry.work_unit_id)
-        .subquery()
-    )
+    # 2. Aggregate & roll up
+    final_balances = (await calculate_balances_for_works(session, [work_id]))[work_id]
+        
+    return final_balances, coa.account_map, coa.children_map
 
-    # 3. Aggregate Data (Consolidated)
+async def calculate_balances_for_works(
+    session: AsyncSession,
+    work_ids: Sequence[int]
+) -> Dict[int, Dict[int, float]]:
+    """
+    Rolled-up balances for several works at once (work_id -> account_id -> amount).
+    Reads the pre-aggregated work_unit_balances rows for all works in one
+    query, then does one batched roll-up over the compiled account tree.
+    """
+    coa = await get_coa_snapshot(session)
+    work_ids = list(dict.fromkeys(work_ids))
+    if not work_ids:
+        return {}
+
+    # 1. Read the materialized per-unit sub-head balances (Consolidated per Work)
     stmt = (
         select(
-            MappedLedgerEntry.account_sub_head_id, 
-            func.sum(TrialBalanceEntry.closing_balance)
-        )
-        .join(TrialBalanceEntry, MappedLedgerEntry.trial_balance_entry_id == TrialBalanceEntry.id)
-        .join(
-            subq, 
-            and_(
-                TrialBalanceEntry.work_unit_id == subq.c.work_unit_id,
-                TrialBalanceEntry.version_number == subq.c.max_ver
-            )
+            WorkUnit.financial_work_id,
+            WorkUnitBalance.account_sub_head_id, 
+            func.sum(WorkUnitBalance.amount)
         )
-        .group_by(MappedLedgerEntry.account_sub_head_id)
+        .join(WorkUnit, WorkUnitBalance.work_unit_id == WorkUnit.id)
+        .where(WorkUnit.financial_work_id.in_(work_ids))
+        .group_by(WorkUnit.financial_work_id, WorkUnitBalance.account_sub_head_id)
     )
     
     results = await session.execute(stmt)
     
-    for account_id, total in results.all():
-        if account_id in balances:
-            balances[account_id] = float(total)
+    balances: Dict[int, Dict[int, float]] = {work_id: {} for work_id in work_ids}
+    for work_id, account_id, total in results.all():
+        balances[work_id][account_id] = float(total)
 
-    # 4. Roll up
-    final_balances = {}
-    def get_balance(acc_id: int) -> float:
-        if acc_id in final_balances: return final_balances[acc_id]
-        total = balances.get(acc_id, 0.0)
-        if acc_id in children_map:
-            for child_id in children_map[acc_id]:
-                total += get_balance(child_id)
-        final_balances[acc_id] = total
-        return total
-
-    root_accounts = [acc for acc in all_accounts if acc.parent_id is None]
-    for root in root_accounts:
-        get_balance(root.id)
-        
-    return final_balances, account_map, children_map
\ No newline at end of file
+    # 2. Roll up
+    rolled = coa.rollup_tree.rollup_many([balances[work_id] for work_id in work_ids])
+    return dict(zip(work_ids, rolled))
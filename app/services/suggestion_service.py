@@ -0,0 +1,167 @@
+# app/services/suggestion_service.py
+import asyncio
+from typing import Dict, Iterable, List, Optional, Sequence, Set, Tuple
+import numpy as np
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select
+from app.models.domain import AccountType, MappedLedgerEntry, TrialBalanceEntry
+from app.services.coa_cache import get_coa_snapshot
+from app.utils.csv_parser import normalize_account_name
+
+NGRAM_SIZE = 3
+
+def _ngrams(name: str) -> Set[str]:
+    """Character trigrams of the normalized name, padded so short names still match."""
+    text = f" {normalize_account_name(name)} "
+    return {text[i:i + NGRAM_SIZE] for i in range(max(len(text) - NGRAM_SIZE + 1, 1))}
+
+class SuggestionIndex:
+    """
+    Character n-gram inverted index over SUB_HEAD names and every ledger
+    name that has ever been mapped (firm-wide).
+    Each sub-head gets a profile: how many of its indexed names contain each
+    n-gram. Postings run n-gram -> sub-heads, so a lookup touches at most one
+    entry per sub-head however many ledgers are indexed. Queries are scored
+    by IDF-weighted cosine similarity against the profiles.
+    Names are only ever added, so updates are incremental.
+    """
+    def __init__(self):
+        self.coa_version = -1
+        self._doc_keys: Set[Tuple[str, int]] = set()
+        self._sub_head_ids: List[int] = []
+        self._sub_head_pos: Dict[int, int] = {}
+        self._sum_sq: List[float] = []
+        self._postings: Dict[str, Dict[int, int]] = {} # gram -> {sub-head position: name count}
+        # numpy views of postings/norms, dropped whenever the underlying data changes
+        self._arrays: Dict[str, Tuple[np.ndarray, np.ndarray]] = {}
+        self._norms: Optional[np.ndarray] = None
+
+    def __len__(self):
+        return len(self._doc_keys)
+
+    def add(self, name: str, sub_head_id: int):
+        key = (normalize_account_name(name), sub_head_id)
+        if not key[0] or key in self._doc_keys:
+            return
+        self._doc_keys.add(key)
+
+        pos = self._sub_head_pos.get(sub_head_id)
+        if pos is None:
+            pos = self._sub_head_pos[sub_head_id] = len(self._sub_head_ids)
+            self._sub_head_ids.append(sub_head_id)
+            self._sum_sq.append(0.0)
+
+        for gram in _ngrams(name):
+            counts = self._postings.setdefault(gram, {})
+            count = counts.get(pos, 0)
+            counts[pos] = count + 1
+            self._sum_sq[pos] += 2 * count + 1 # (c + 1)^2 - c^2
+            self._arrays.pop(gram, None)
+        self._norms = None
+
+    def add_many(self, pairs: Iterable[Tuple[str, int]]):
+        for name, sub_head_id in pairs:
+            self.add(name, sub_head_id)
+
+    def _posting_arrays(self, gram: str) -> Tuple[np.ndarray, np.ndarray]:
+        arrays = self._arrays.get(gram)
+        if arrays is None:
+            counts = self._postings[gram]
+            arrays = self._arrays[gram] = (
+                np.fromiter(counts.keys(), dtype=np.int64, count=len(counts)),
+                np.fromiter(counts.values(), dtype=np.float64, count=len(counts))
+            )
+        return arrays
+
+    def suggest(self, name: str, top_k: int = 3) -> List[Tuple[int, float]]:
+        """Best `top_k` (sub_head_id, score) pairs for one ledger name, score in (0, 1]."""
+        n_sub_heads = len(self._sub_head_ids)
+        if not n_sub_heads:
+            return []
+        if self._norms is None:
+            self._norms = np.sqrt(np.asarray(self._sum_sq, dtype=np.float64))
+
+        positions, weights = [], []
+        query_sq = 0.0
+        for gram in _ngrams(name):
+            counts = self._postings.get(gram)
+            # Unseen n-grams still count towards the query norm at maximum rarity
+            idf = np.log1p(n_sub_heads / len(counts)) if counts else np.log1p(n_sub_heads)
+            query_sq += idf * idf
+            if counts:
+                pos, cnt = self._posting_arrays(gram)
+                positions.append(pos)
+                weights.append(cnt * idf)
+        if not positions:
+            return []
+
+        dots = np.bincount(np.concatenate(positions), weights=np.concatenate(weights), minlength=n_sub_heads)
+        scores = dots / (self._norms * np.sqrt(query_sq))
+
+        k = min(top_k, n_sub_heads)
+        best = np.argpartition(-scores, k - 1)[:k]
+        best = best[np.argsort(-scores[best], kind="stable")]
+        return [
+            (self._sub_head_ids[pos], round(float(scores[pos]), 4))
+            for pos in best.tolist() if scores[pos] > 0
+        ]
+
+# Process-wide index, built on first use
+_index: Optional[SuggestionIndex] = None
+_build_lock = asyncio.Lock()
+
+async def get_suggestion_index(session: AsyncSession) -> SuggestionIndex:
+    """Returns the shared index, building it once and folding in new sub-heads."""
+    global _index
+    coa = await get_coa_snapshot(session)
+    async with _build_lock:
+        if _index is None:
+            index = SuggestionIndex()
+            result = await session.execute(
+                select(TrialBalanceEntry.account_name, MappedLedgerEntry.account_sub_head_id)
+                .join(MappedLedgerEntry, MappedLedgerEntry.trial_balance_entry_id == TrialBalanceEntry.id)
+                .distinct()
+            )
+            index.add_many(result.all())
+            _index = index
+
+        # Accounts are append-only, so a CoA change only ever adds sub-heads
+        if _index.coa_version != coa.version:
+            _index.add_many(
+                (acc.name, acc.id) for acc in coa.account_map.values()
+                if acc.type == AccountType.SUB_HEAD
+            )
+            _index.coa_version = coa.version
+    return _index
+
+def record_mappings(pairs: Iterable[Tuple[str, int]]):
+    """Adds newly mapped (ledger name, sub-head) pairs; a no-op until the index is built."""
+    if _index is not None:
+        _index.add_many(pairs)
+
+async def suggest_mappings(
+    session: AsyncSession,
+    entries: Sequence[TrialBalanceEntry],
+    top_k: int = 3
+):
+    """Top-k sub-head suggestions for each entry (typically the work's unmapped ones)."""
+    index = await get_suggestion_index(session)
+    coa = await get_coa_snapshot(session)
+
+    # Ledgers repeat across units, so score each distinct name once
+    cache: Dict[str, List[Tuple[int, float]]] = {}
+    output = []
+    for entry in entries:
+        key = normalize_account_name(entry.account_name)
+        if key not in cache:
+            cache[key] = index.suggest(entry.account_name, top_k)
+        output.append({
+            "trial_balance_entry_id": entry.id,
+            "account_name": entry.account_name,
+            "suggestions": [
+                {"account_sub_head_id": sub_head_id, "name": coa.account_map[sub_head_id].name, "score": score}
+                for sub_head_id, score in cache[key]
+                if sub_head_id in coa.account_map
+            ]
+        })
+    return output
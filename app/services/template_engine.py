@@ -0,0 +1,67 @@
+# app/services/template_engine.py
+"""
+Shared Jinja environment for every rendered document.
+Compiled templates are kept in an LRU keyed by a hash of their source, so a
+template string is compiled once per process however often it is rendered.
+With JINJA_BYTECODE_CACHE_DIR set, compiled bytecode is also written to disk
+and new worker processes start warm.
+"""
+import hashlib
+import os
+from collections import OrderedDict
+from jinja2 import BaseLoader, Environment, FileSystemBytecodeCache, Template
+
+from app.core.config import settings
+from app.utils.formatting import format_indian_currency
+
+def _make_environment() -> Environment:
+    bytecode_cache = None
+    if settings.JINJA_BYTECODE_CACHE_DIR:
+        os.makedirs(settings.JINJA_BYTECODE_CACHE_DIR, exist_ok=True)
+        bytecode_cache = FileSystemBytecodeCache(settings.JINJA_BYTECODE_CACHE_DIR)
+    env = Environment(loader=BaseLoader(), bytecode_cache=bytecode_cache)
+    env.filters['indian_currency'] = format_indian_currency
+    return env
+
+environment = _make_environment()
+
+class TemplateCache:
+    """LRU of compiled templates keyed by the SHA-256 of their source."""
+    def __init__(self, env: Environment, maxsize: int):
+        self.env = env
+        self.maxsize = maxsize
+        self._templates: "OrderedDict[str, Template]" = OrderedDict()
+
+    def __len__(self):
+        return len(self._templates)
+
+    def get(self, source: str) -> Template:
+        key = hashlib.sha256(source.encode()).hexdigest()
+        template = self._templates.get(key)
+        if template is not None:
+            self._templates.move_to_end(key)
+            return template
+
+        template = self._compile(key, source)
+        self._templates[key] = template
+        if len(self._templates) > self.maxsize:
+            self._templates.popitem(last=False)
+        return template
+
+    def _compile(self, key: str, source: str) -> Template:
+        # Same steps as jinja2.BaseLoader.load, so the bytecode cache is used for strings too
+        bcc = self.env.bytecode_cache
+        bucket = bcc.get_bucket(self.env, key, None, source) if bcc is not None else None
+        code = bucket.code if bucket is not None else None
+        if code is None:
+            code = self.env.compile(source, name=key)
+            if bucket is not None:
+                bucket.code = code
+                bcc.set_bucket(bucket)
+        return self.env.template_class.from_code(self.env, code, self.env.make_globals(None))
+
+template_cache = TemplateCache(environment, settings.TEMPLATE_CACHE_SIZE)
+
+def get_template(source: str) -> Template:
+    """Compiled template for `source`, compiling it only on first use."""
+    return template_cache.get(source)
@@ -1,55 +1,103 @@
 # app/services/trial_balance_service.py
+from typing import BinaryIO, Optional, Union
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, func
+from sqlalchemy import select, func, update
 from fastapi import HTTPException
+from app.core.config import settings
+from app.core.database import set_statement_timeout
 from app.models.domain import TrialBalanceEntry, FinancialWork, WorkUnit
-from app.utils.csv_parser import parse_trial_balance
+from app.services.artifact_cache import bump_work_revision
+from app.services.balance_snapshot_service import refresh_unit_balances
+from app.services.bulk_write_service import insert_trial_balance_entries
+from app.services.carry_forward_service import carry_forward_mappings
+from app.services.mapping_rule_service import apply_mapping_rules
+from app.services.suggestion_service import record_mappings
+from app.utils.csv_parser import iter_trial_balance_batches
+
+# Rows parsed and inserted per executemany during ingestion
+TB_BATCH_SIZE = 5000
 
 async def process_trial_balance_upload(
     session: AsyncSession, 
     work_id: int, 
     unit_id: int,
-    file_contents: bytes
+    file_contents: Union[bytes, BinaryIO]
 ):
-    # 1. Verify Unit belongs to Work
-    unit = await session.get(WorkUnit, unit_id)
+    """
+    Ingests a TB upload as a new version of the unit.
+    `file_contents` may be raw bytes or a file object (e.g. `UploadFile.file`);
+    rows are parsed and bulk-inserted in batches of TB_BATCH_SIZE inside a
+    single transaction, so memory stays flat regardless of the ledger size.
+    """
+    # Large ledgers legitimately run past the per-statement default
+    await set_statement_timeout(session, settings.DB_BULK_STATEMENT_TIMEOUT_MS)
+
+    # 1. Reserve the new version number first: this locks the unit's row, so
+    #    the unit read below is current even if another upload just finished
+    new_version = await allocate_version(session, unit_id)
+
+    # 2. Verify Unit belongs to Work
+    unit = await session.get(WorkUnit, unit_id, populate_existing=True)
     if not unit or unit.financial_work_id != work_id:
+        await session.rollback()
         raise HTTPException(status_code=404, detail="Work Unit not found")
+    
+    # 3. Parse & insert batch by batch
+    entries_processed = 0
+    try:
+        for batch in iter_trial_balance_batches(file_contents, TB_BATCH_SIZE):
+            entries_processed += await insert_trial_balance_entries(session, unit_id, new_version, batch)
+    except ValueError as e:
+        await session.rollback()
+        print(f"Parsing error: {e}")
+        raise HTTPException(status_code=400, detail="Failed to parse CSV or empty file")
 
-    # 2. Parse CSV
-    parsed_data = parse_trial_balance(file_contents)
-    if not parsed_data:
+    if not entries_processed:
+        await session.rollback()
         raise HTTPException(status_code=400, detail="Failed to parse CSV or empty file")
 
-    # 3. Determine New Version Number
-    stmt = select(func.max(TrialBalanceEntry.version_number)).where(TrialBalanceEntry.work_unit_id == unit_id)
-    result = await session.execute(stmt)
-    current_max = result.scalar() or 0
-    new_version = current_max + 1
-    
-    # 4. Bulk Create new entries
-    new_entries = [
-        TrialBalanceEntry(
-            work_unit_id=unit_id,
-            version_number=new_version,
-            account_name=row['account_name'],
-            debit=row['debit'],
-            credit=row['credit'],
-            closing_balance=row['closing_balance']
-        )
-        for row in parsed_data
-    ]
-    
-    session.add_all(new_entries)
+    # 4. Carry mappings over from the previous version / prior year
+    carried_forward, learned = await carry_forward_mappings(session, unit, new_version)
+
+    # 5. Auto-map whatever is left using the firm & company rules
+    mapped_by_rules, learned_from_rules = await apply_mapping_rules(session, unit, new_version)
+
+    # Publish the new version in the same transaction as its rows
+    unit.current_version = new_version
+    await refresh_unit_balances(session, unit_id, new_version)
+    await bump_work_revision(session, work_id)
     await session.commit()
+    # Only mappings that reached the database go into the suggestion index
+    record_mappings(learned | learned_from_rules)
     
     return {
         "status": "success", 
-        "entries_processed": len(new_entries), 
+        "entries_processed": entries_processed, 
         "version": new_version,
-        "unit": unit.unit_name
+        "unit": unit.unit_name,
+        "mappings_carried_forward": carried_forward,
+        "mappings_from_rules": mapped_by_rules
     }
 
+async def allocate_version(session: AsyncSession, unit_id: int) -> Optional[int]:
+    """
+    Atomically takes the next TB version number of a unit (None if the unit does not exist).
+    The counter UPDATE row-locks the unit until the caller's transaction ends:
+    concurrent uploads to the same unit queue here and each gets its own
+    number, uploads to other units are unaffected, and a rollback hands the
+    number back.
+    """
+    result = await session.execute(
+        update(WorkUnit)
+        .where(WorkUnit.id == unit_id)
+        .values(last_allocated_version=WorkUnit.last_allocated_version + 1)
+    )
+    if result.rowcount == 0:
+        return None
+    return (await session.execute(
+        select(WorkUnit.last_allocated_version).where(WorkUnit.id == unit_id)
+    )).scalar_one()
+
 async def get_unit_versions(session: AsyncSession, unit_id: int):
     """Returns a list of available versions for a unit."""
     stmt = (
@@ -63,35 +111,25 @@ async def get_unit_versions(session: AsyncSession, unit_id: int):
 
 async def get_tb_totals(session: AsyncSession, work_id: int):
     """Calculates the total Debit/Credit for the LATEST version of all units."""
-    # Subquery for max version per unit
-    subq = (
-        select(
-            TrialBalanceEntry.work_unit_id,
-            func.max(TrialBalanceEntry.version_number).label("max_ver")
-        )
-        .join(WorkUnit, TrialBalanceEntry.work_unit_id == WorkUnit.id)
-        .where(WorkUnit.financial_work_id == work_id)
-        .group_by(TrialBalanceEntry.work_unit_id)
-        .subquery()
-    )
-    
     stmt = (
         select(
             func.sum(TrialBalanceEntry.debit),
             func.sum(TrialBalanceEntry.credit)
         )
         .join(
-            subq, 
-            (TrialBalanceEntry.work_unit_id == subq.c.work_unit_id) & 
-            (TrialBalanceEntry.version_number == subq.c.max_ver)
+            WorkUnit, 
+            (TrialBalanceEntry.work_unit_id == WorkUnit.id) & 
+            (TrialBalanceEntry.version_number == WorkUnit.current_version)
         )
+        .where(WorkUnit.financial_work_id == work_id)
     )
     
     result = await session.execute(stmt)
     row = result.first()
     
-    total_debit = row[0] or 0.0
-    total_credit = row[1] or 0.0
+    # int 0, not 0.0: a zero Decimal sum is falsy and Decimal - float raises
+    total_debit = row[0] or 0
+    total_credit = row[1] or 0
     
     return {
         "total_debit": float(total_debit),
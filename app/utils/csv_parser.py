@@ -1,7 +1,7 @@
 # app/utils/csv_parser.py
 import pandas as pd
 from io import BytesIO
-from typing import List, Dict, Any
+from typing import List, Dict, Any, BinaryIO, Iterator, Union
 
 def clean_currency(value: Any) -> float:
     """
@@ -29,6 +29,58 @@ def clean_currency(value: Any) -> float:
     except ValueError:
         return 0.0
 
+# Plain decimals that pandas parses to exactly what float() returns (at most 15 characters,
+# so at most 15 digits: exact as a double before the one scaling step)
+_PLAIN_DECIMAL = r'[+-]?(?:[0-9]+\.?[0-9]*|\.[0-9]+)'
+_PLAIN_MAX_LENGTH = 15
+
+def clean_currency_column(series: pd.Series) -> pd.Series:
+    """
+    Column-wide version of `clean_currency`, with the same output per value.
+    Strips and removes quotes, commas and spaces exactly as `clean_currency`
+    does and parses the plain amounts in one pass; blanks and dashes become
+    0.0 and the rare other values (exponents, "1_000", very long amounts) go through
+    `clean_currency` itself.
+    """
+    s = series.astype("string").str.strip().str.replace(r'[", ]', '', regex=True)
+    plain = ((s.str.len() <= _PLAIN_MAX_LENGTH) & s.str.fullmatch(_PLAIN_DECIMAL)).fillna(False)
+    values = pd.to_numeric(s.where(plain), errors='coerce').astype(float).fillna(0.0)
+    other = ~plain & s.notna() & ~s.isin(['', '-'])
+    if other.any():
+        values[other] = series[other].map(clean_currency)
+    return values
+
+def trial_balance_records(df: pd.DataFrame) -> List[Dict[str, Any]]:
+    """
+    Converts a header-normalized TB frame into entry records.
+    Drops blank and TOTAL rows and computes Debit - Credit as arrays.
+    """
+    names = df['account name'].fillna('').astype(str).str.strip()
+
+    # Skip empty rows or total rows (your file has a 'TOTAL' row at the bottom)
+    keep = (names != '') & (names.str.upper() != 'TOTAL')
+    if not keep.any():
+        return []
+
+    zeros = pd.Series(0.0, index=df.index)
+    debit = clean_currency_column(df['debit'])[keep] if 'debit' in df.columns else zeros[keep]
+    credit = clean_currency_column(df['credit'])[keep] if 'credit' in df.columns else zeros[keep]
+
+    # Recalculate rather than trusting the 'closing balance' column: Debit - Credit
+    closing_balance = debit - credit
+
+    return [
+        {
+            "account_name": name,
+            "debit": d,
+            "credit": c,
+            "closing_balance": cb
+        }
+        for name, d, c, cb in zip(
+            names[keep].tolist(), debit.tolist(), credit.tolist(), closing_balance.tolist()
+        )
+    ]
+
 def parse_trial_balance(file_contents: bytes) -> List[Dict[str, Any]]:
     """
     Parses the Trial Balance CSV, handling the specific 4-row header skip.
@@ -50,31 +102,40 @@ def parse_trial_balance(file_contents: bytes) -> List[Dict[str, Any]]:
             print("Warning: 'account name' column not found. Columns are:", df.columns)
             return []
 
-        results = []
-        for _, row in df.iterrows():
-            # 4. Clean and convert data
-            name = str(row.get('account name', '')).strip()
-            
-            # Skip empty rows or total rows (your file has a 'TOTAL' row at the bottom)
-            if not name or name.upper() == 'TOTAL': 
-                continue
-                
-            debit = clean_currency(row.get('debit', 0))
-            credit = clean_currency(row.get('credit', 0))
-            
-            # 5. Calculate closing balance
-            # Ideally, we verify this against the 'closing balance' column in your CSV
-            # But usually, it's safer to recalculate: Debit - Credit
-            closing_balance = debit - credit
-            
-            results.append({
-                "account_name": name,
-                "debit": debit,
-                "credit": credit,
-                "closing_balance": closing_balance
-            })
-            
-        return results
+        # 4. Clean and convert whole columns at once
+        return trial_balance_records(df)
     except Exception as e:
         print(f"Parsing error: {e}")
-        return []
\ No newline at end of file
+        return []
+
+def iter_trial_balance_batches(
+    source: Union[bytes, BinaryIO],
+    batch_size: int = 5000
+) -> Iterator[List[Dict[str, Any]]]:
+    """
+    Streaming variant of `parse_trial_balance`.
+    Reads the CSV `batch_size` rows at a time so only one batch of the
+    ledger is held in memory. Errors past the header are raised so the
+    caller can roll back whatever it already wrote.
+    """
+    if isinstance(source, (bytes, bytearray)):
+        source = BytesIO(source)
+
+    reader = pd.read_csv(source, skiprows=4, dtype=str, chunksize=batch_size)
+    with reader:
+        for df in reader:
+            df.columns = [c.strip().lower() for c in df.columns]
+            if 'account name' not in df.columns:
+                print("Warning: 'account name' column not found. Columns are:", df.columns)
+                return
+
+            records = trial_balance_records(df)
+            if records:
+                yield records
+
+def normalize_account_name(name: str) -> str:
+    """
+    Canonical form of a ledger name for matching across uploads/years.
+    Case-insensitive and whitespace-insensitive: " Cash  in Hand " -> "cash in hand"
+    """
+    return " ".join(str(name).split()).casefold()
@@ -0,0 +1,31 @@
+# app/utils/formatting.py
+def format_indian_currency(value):
+    """
+    Formats a number to Indian Currency format (Lakhs/Crores).
+    Example: 1234567.89 -> 12,34,567.89
+    """
+    if value is None: return "0.00"
+    
+    is_negative = value < 0
+    value = abs(value)
+    
+    value_str = "{:.2f}".format(value)
+    amount, fraction = value_str.split('.')
+    
+    if len(amount) <= 3:
+        res = amount
+    else:
+        last_three = amount[-3:]
+        remaining = amount[:-3]
+        
+        # Regex-like split for every 2 digits reversed
+        groups = []
+        while remaining:
+            groups.append(remaining[-2:])
+            remaining = remaining[:-2]
+        
+        groups.reverse()
+        res = ",".join(groups) + "," + last_three
+        
+    final = f"{res}.{fraction}"
+    return f"({final})" if is_negative else final
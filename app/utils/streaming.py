@@ -0,0 +1,24 @@
+# app/utils/streaming.py
+import os
+from typing import BinaryIO, Iterator
+from fastapi.responses import StreamingResponse
+
+# Bytes read from disk per chunk sent
+CHUNK_SIZE = 64 * 1024
+
+def iter_file(f: BinaryIO, chunk_size: int = CHUNK_SIZE) -> Iterator[bytes]:
+    """Reads `f` from the start in chunks, closing it when done (or when the client goes away)."""
+    with f:
+        f.seek(0)
+        while chunk := f.read(chunk_size):
+            yield chunk
+
+def file_response(f: BinaryIO, media_type: str, headers: dict) -> StreamingResponse:
+    """
+    Streams an open file; memory per download stays at one chunk.
+    Taking an open file rather than a path keeps it readable even if the
+    artifact cache evicts it mid-download.
+    """
+    headers = {**headers, "Content-Length": str(os.fstat(f.fileno()).st_size)}
+    # A sync iterator: Starlette reads it in the threadpool, off the event loop
+    return StreamingResponse(iter_file(f), media_type=media_type, headers=headers)
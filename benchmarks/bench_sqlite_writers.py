@@ -0,0 +1,154 @@
+# benchmarks/bench_sqlite_writers.py
+"""
+Concurrency stress test for SQLite: parallel TB uploads, single mapping
+clicks and statement reads against one database file, first with the
+plain dev profile, then in SQLite production mode (WAL + single writer queue).
+Prints throughput per operation and the number of "database is locked" errors.
+
+    python -m benchmarks.bench_sqlite_writers [uploaders] [clickers] [readers] [seconds] [ledger rows]
+
+At the end the balance snapshot (work_unit_balances) is compared with a full
+recompute from the mapped entries of each unit's current version.
+Exits non-zero if production mode hit any lock error, or if either mode's
+snapshot drifted. With large ledgers the
+dev profile fails writes once an upload holds the lock past the 5 s default
+timeout; production mode queues them instead (so single clicks wait behind
+uploads), and reads never wait on the writer.
+"""
+import asyncio
+import datetime
+import random
+import sys
+import tempfile
+import time
+from collections import Counter
+
+from sqlalchemy import and_, func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import sessionmaker
+
+from app.core.config import settings
+from app.core.database import build_engines
+from app.models.domain import (
+    Account, AccountType, Base, Company, FinancialWork, MappedLedgerEntry, TrialBalanceEntry, WorkUnit, WorkUnitBalance
+)
+from app.services.coa_cache import bump_coa_version
+from app.services.mapping_service import map_entry_to_account
+from app.services.trial_balance_service import get_tb_totals, process_trial_balance_upload
+
+def make_csv(rows: int) -> bytes:
+    header = b"Company\nPeriod\n\n\nAccount Name,Debit,Credit,Closing Balance\n"
+    return header + "".join(f"Ledger {i},{i}.00,0,{i}.00\n" for i in range(rows)).encode()
+
+async def seed(Session, units: int):
+    async with Session() as session:
+        company = Company(legal_name="Stress Co")
+        category = Account(name="Assets", type=AccountType.CATEGORY.value, category_type="ASSET")
+        session.add_all([company, category])
+        await session.flush()
+        head = Account(name="Current Assets", type=AccountType.HEAD.value, category_type="ASSET", parent_id=category.id)
+        session.add(head)
+        await session.flush()
+        sub_heads = [Account(name=f"Sub head {i}", type=AccountType.SUB_HEAD.value, category_type="ASSET", parent_id=head.id) for i in range(5)]
+        work = FinancialWork(company_id=company.id, start_date=datetime.date(2024, 4, 1), end_date=datetime.date(2025, 3, 31))
+        session.add_all(sub_heads + [work])
+        await session.flush()
+        session.add_all(WorkUnit(financial_work_id=work.id, unit_name=f"Unit {i}") for i in range(units))
+        await session.commit()
+        unit_ids = (await session.execute(select(WorkUnit.id).order_by(WorkUnit.id))).scalars().all()
+        return work.id, list(unit_ids), [a.id for a in sub_heads]
+
+async def snapshot_drift(Session) -> dict:
+    """(unit, sub-head) -> (snapshot amount, recomputed amount) wherever the two differ."""
+    async with Session() as session:
+        stored = dict(((u, s), a) for u, s, a in (await session.execute(
+            select(WorkUnitBalance.work_unit_id, WorkUnitBalance.account_sub_head_id, WorkUnitBalance.amount)
+        )).all())
+        recomputed = dict(((u, s), a) for u, s, a in (await session.execute(
+            select(TrialBalanceEntry.work_unit_id, MappedLedgerEntry.account_sub_head_id, func.sum(TrialBalanceEntry.closing_balance))
+            .join(MappedLedgerEntry, MappedLedgerEntry.trial_balance_entry_id == TrialBalanceEntry.id)
+            .join(WorkUnit, and_(
+                TrialBalanceEntry.work_unit_id == WorkUnit.id,
+                TrialBalanceEntry.version_number == WorkUnit.current_version
+            ))
+            .group_by(TrialBalanceEntry.work_unit_id, MappedLedgerEntry.account_sub_head_id)
+        )).all())
+    return {
+        key: (stored.get(key, 0), recomputed.get(key, 0))
+        for key in stored.keys() | recomputed.keys()
+        if stored.get(key, 0) != recomputed.get(key, 0)
+    }
+
+async def run(mode: str, uploaders: int, clickers: int, readers: int, seconds: float, rows: int) -> int:
+    settings.SQLITE_PRODUCTION = mode == "production"
+    bump_coa_version()
+    with tempfile.TemporaryDirectory() as tmp:
+        read_engine, write_engine = build_engines(f"sqlite+aiosqlite:///{tmp}/stress.db")
+        async with write_engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        ReadSession = sessionmaker(read_engine, class_=AsyncSession, expire_on_commit=False)
+        WriteSession = sessionmaker(write_engine, class_=AsyncSession, expire_on_commit=False)
+        work_id, unit_ids, sub_head_ids = await seed(WriteSession, uploaders)
+
+        ledger = make_csv(rows)
+        done = Counter()
+        errors = Counter()
+        deadline = time.perf_counter() + seconds
+
+        async def attempt(kind: str, session_factory, operation):
+            try:
+                async with session_factory() as session:
+                    await operation(session)
+                done[kind] += 1
+            except Exception as e:
+                errors["database is locked" if "locked" in str(e) else type(e).__name__] += 1
+
+        async def uploader(unit_id):
+            # One unit per uploader: same-unit uploads are a separate concern
+            while time.perf_counter() < deadline:
+                await attempt("upload", WriteSession, lambda s: process_trial_balance_upload(s, work_id, unit_id, ledger))
+
+        async def clicker():
+            while time.perf_counter() < deadline:
+                async def click(session):
+                    entry_id = (await session.execute(
+                        select(TrialBalanceEntry.id).order_by(TrialBalanceEntry.id.desc()).limit(1)
+                    )).scalar()
+                    if entry_id is None:
+                        await asyncio.sleep(0.01)
+                        return
+                    await map_entry_to_account(session, random.randint(1, entry_id), random.choice(sub_head_ids))
+                await attempt("mapping click", WriteSession, click)
+
+        async def reader():
+            while time.perf_counter() < deadline:
+                await attempt("tb totals read", ReadSession, lambda s: get_tb_totals(s, work_id))
+
+        start = time.perf_counter()
+        await asyncio.gather(
+            *(uploader(unit_id) for unit_id in unit_ids),
+            *(clicker() for _ in range(clickers)),
+            *(reader() for _ in range(readers)),
+        )
+        elapsed = time.perf_counter() - start
+
+        print(f"{mode}: {uploaders} uploaders ({rows} rows each), {clickers} clickers, {readers} readers, {elapsed:.1f}s")
+        for kind in ("upload", "mapping click", "tb totals read"):
+            print(f"  {kind:<15}: {done[kind]:6d} ok  {done[kind] / elapsed:8.1f}/s")
+        print(f"  errors         : {dict(errors) or 'none'}")
+        drift = await snapshot_drift(WriteSession)
+        print(f"  balance drift  : {len(drift) or 'none'}{f' e.g. {next(iter(drift.items()))}' if drift else ''}")
+
+        await read_engine.dispose()
+        if write_engine is not read_engine:
+            await write_engine.dispose()
+        return errors["database is locked"], len(drift)
+
+if __name__ == "__main__":
+    defaults = ["3", "4", "4", "20", "100000"]
+    args = sys.argv[1:] + defaults[len(sys.argv) - 1:]
+    uploaders, clickers, readers, rows = int(args[0]), int(args[1]), int(args[2]), int(args[4])
+    seconds = float(args[3])
+    _, dev_drift = asyncio.run(run("dev", uploaders, clickers, readers, seconds, rows))
+    locked, drift = asyncio.run(run("production", uploaders, clickers, readers, seconds, rows))
+    sys.exit(1 if locked or drift or dev_drift else 0)
@@ -0,0 +1,85 @@
+# benchmarks/bench_statement_render.py
+"""
+Statement HTML render time: a fresh Environment + compile per download (old)
+vs the shared compiled-template cache, plus cold start with a bytecode cache.
+
+    python -m benchmarks.bench_statement_render [iterations]
+"""
+import random
+import sys
+import tempfile
+import time
+from types import SimpleNamespace
+
+from jinja2 import BaseLoader, Environment, FileSystemBytecodeCache
+
+from app.models.domain import WorkStatus
+from app.services.report_service import PDF_HTML_TEMPLATE, _render_statement_html
+from app.services.template_engine import TemplateCache
+from app.utils.formatting import format_indian_currency
+
+def build_data(line_items: int = 120, notes: int = 25):
+    rnd = random.Random(1)
+    template_def = [{"type": "header_block", "text": "BALANCE SHEET"}]
+    for i in range(line_items):
+        if i % 15 == 0:
+            template_def.append({"type": "title", "text": f"Section {i // 15}"})
+        template_def.append({
+            "type": "financial_line_item", "label": f"Line {i}", "account_head_id": i,
+            "note_ref": str(i % notes), "mandatory": False
+        })
+    return {
+        "company": SimpleNamespace(legal_name="Bench Industries Pvt Ltd"),
+        "work_status": WorkStatus.DRAFT.value,
+        "template_def": template_def,
+        "balances": {i: rnd.uniform(-1e7, 1e7) for i in range(line_items)},
+        "notes_data": [
+            {"ref": str(n + 3), "title": f"Note {n}", "custom_text": "",
+             "children": [{"name": f"Child {c}", "amount": rnd.uniform(0, 1e6)} for c in range(8)],
+             "total": rnd.uniform(0, 1e7)}
+            for n in range(notes)
+        ],
+        "note_map": {str(n): str(n + 3) for n in range(notes)},
+    }
+
+def render_uncached(data):
+    """What _render_pdf used to do on every download."""
+    env = Environment(loader=BaseLoader())
+    env.filters['indian_currency'] = format_indian_currency
+    template = env.from_string(PDF_HTML_TEMPLATE)
+    return template.render(
+        company_name=data['company'].legal_name,
+        template_def=data['template_def'],
+        data=data['balances'],
+        notes_data=data['notes_data'],
+        note_map=data['note_map'],
+        is_draft=(data['work_status'] != WorkStatus.FINALIZED.value)
+    )
+
+def timed(fn, iterations):
+    start = time.perf_counter()
+    for _ in range(iterations):
+        fn()
+    return (time.perf_counter() - start) / iterations * 1000
+
+def cold_compile_ms(bytecode_dir=None):
+    env = Environment(loader=BaseLoader(), bytecode_cache=FileSystemBytecodeCache(bytecode_dir) if bytecode_dir else None)
+    env.filters['indian_currency'] = format_indian_currency
+    start = time.perf_counter()
+    TemplateCache(env, 1).get(PDF_HTML_TEMPLATE)
+    return (time.perf_counter() - start) * 1000
+
+if __name__ == "__main__":
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    data = build_data()
+    assert render_uncached(data) == _render_statement_html(data)
+
+    print(f"per render, {iterations} iterations")
+    print(f"fresh env + compile : {timed(lambda: render_uncached(data), iterations):8.3f} ms")
+    print(f"cached template     : {timed(lambda: _render_statement_html(data), iterations):8.3f} ms")
+
+    with tempfile.TemporaryDirectory() as bytecode_dir:
+        cold_compile_ms(bytecode_dir) # populate
+        print("first compile in a new process")
+        print(f"no bytecode cache   : {cold_compile_ms():8.3f} ms")
+        print(f"warm bytecode cache : {cold_compile_ms(bytecode_dir):8.3f} ms")
@@ -0,0 +1,124 @@
+# benchmarks/bench_xlsx_render.py
+"""
+XLSX vs PDF statement render time, and peak Python memory of the XLSX render,
+as the notes schedule grows. Write-only mode should keep the XLSX peak roughly
+flat. The PDF column is the full PDF path after the data load (Jinja HTML plus
+the WeasyPrint render in the worker pool), the same call write_report makes.
+First checks that the XLSX amount formats show the same digit grouping as the
+PDF (lakh / crore, including 100 crore and up); exits non-zero if not.
+
+    python -m benchmarks.bench_xlsx_render
+"""
+import asyncio
+import os
+import random
+import re
+import sys
+import tempfile
+import time
+import tracemalloc
+from types import SimpleNamespace
+
+from app.core.config import settings
+from app.models.domain import WorkStatus
+from app.services.pdf_renderer import shutdown_renderer
+from app.services.report_service import _render_excel, _write_rendered, indian_number_format
+from app.utils.formatting import format_indian_currency
+
+FORMAT_CHECK_VALUES = [
+    0, 5, 999.5, 12345.67, 99999.99, 100000, 1234567.89, 12345678.9, 99999999.99,
+    100000000, 999999999.99, 1000000000, 12345678901.23, 100000000000, 987654321098765.43,
+]
+
+def excel_display(value: float, number_format: str) -> str:
+    """How Excel shows `value` under one of the formats above (digit placeholders, literal or grouping commas)."""
+    positive, negative = number_format.split(';')
+    section = negative[1:-1] if value < 0 else positive
+    integer_part, decimals = f"{abs(value):.2f}".split('.')
+    pattern = section.split('.')[0]
+    if ',' in pattern.replace('\\,', ''):
+        # Plain thousands separator: groups of three
+        text = f"{int(integer_part):,}"
+    else:
+        digits, out = list(integer_part), []
+        for token in reversed(re.findall(r'\\,|[#0]', pattern)):
+            if token == '\\,':
+                out.append(',')
+            elif digits:
+                out.append(digits.pop())
+            elif token == '0':
+                out.append('0')
+        # Digits beyond the placeholders go in front of the leftmost one
+        text = ''.join(digits) + ''.join(reversed(out))
+    text = f"{text}.{decimals}"
+    return f"({text})" if value < 0 else text
+
+def check_formats() -> list:
+    problems = []
+    for value in FORMAT_CHECK_VALUES + [-v for v in FORMAT_CHECK_VALUES if v]:
+        shown, expected = excel_display(value, indian_number_format(value)), format_indian_currency(value)
+        if shown != expected:
+            problems.append(f"{value}: xlsx shows {shown}, pdf shows {expected}")
+    return problems
+
+def build_data(notes: int, children: int):
+    rnd = random.Random(3)
+    template_def = [{"type": "header_block", "text": "Balance Sheet"}]
+    for i in range(notes):
+        template_def.append({"type": "financial_line_item", "label": f"Line {i}", "account_head_id": i, "note_ref": str(i)})
+    template_def.append({"type": "subtotal", "id": 999, "label": "Total", "mandatory": True})
+    return {
+        "company": SimpleNamespace(legal_name="Bench Industries Pvt Ltd"),
+        "work_status": WorkStatus.DRAFT.value,
+        "template_def": template_def,
+        "balances": {i: rnd.uniform(-1e10, 1e10) for i in range(notes)} | {999: 1.0},
+        "notes_data": [
+            {"ref": str(n + 3), "title": f"Note {n}", "custom_text": "Custom text" if n % 5 == 0 else "",
+             "children": [{"name": f"Ledger {n}-{c}", "amount": rnd.uniform(-1e6, 1e6)} for c in range(children)],
+             "total": rnd.uniform(0, 1e7)}
+            for n in range(notes)
+        ],
+        "note_map": {str(n): str(n + 3) for n in range(notes)},
+    }
+
+def measure_xlsx(data):
+    start = time.perf_counter()
+    out = _render_excel(data)
+    elapsed = time.perf_counter() - start
+    # Separate traced run: tracemalloc slows allocation-heavy code several-fold
+    tracemalloc.start()
+    _render_excel(data)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak, len(out)
+
+async def measure_pdf(data, path: str):
+    start = time.perf_counter()
+    await _write_rendered(data, 'pdf', path)
+    return time.perf_counter() - start, os.path.getsize(path)
+
+async def main() -> int:
+    problems = check_formats()
+    print(f"xlsx number formats: {'match the pdf' if not problems else 'MISMATCH'}")
+    for problem in problems:
+        print(f"    {problem}")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        pdf_path = os.path.join(tmp, "statement.pdf")
+        try:
+            # Worker start-up and the WeasyPrint import are not part of a render
+            await measure_pdf(build_data(1, 1), pdf_path)
+            print(f"{'rows':>8} {'xlsx s':>8} {'xlsx peak MB':>13} {'xlsx KB':>8} {'pdf s':>8} {'pdf KB':>8}")
+            for notes, children in ((50, 20), (200, 100), (400, 250)):
+                data = build_data(notes, children)
+                # Peak excludes the input data, which is built before tracing starts
+                x_time, x_peak, x_size = measure_xlsx(data)
+                p_time, p_size = await measure_pdf(data, pdf_path)
+                print(f"{notes * children:>8} {x_time:>8.2f} {x_peak / 2**20:>13.1f} {x_size / 1024:>8.0f} {p_time:>8.2f} {p_size / 1024:>8.0f}")
+        finally:
+            shutdown_renderer()
+    return len(problems)
+
+if __name__ == "__main__":
+    settings.PDF_RENDER_TIMEOUT = 3600 # The largest schedule is meant to take long, not to hit the 504
+    sys.exit(1 if asyncio.run(main()) else 0)